@@ -3,9 +3,16 @@ import numpy as np
 from sklearn.cluster import KMeans
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import silhouette_score
-from typing import Dict, Any
+from joblib import Parallel, delayed
+from typing import Dict, Any, Optional
 import matplotlib.pyplot as plt # Optional, for analysis
 
+
+def _fit_kmeans_once(X: np.ndarray, n_clusters: int, seed: int) -> KMeans:
+    """Single-initialisation K-Means fit; one task of the parallel multi-start search."""
+    return KMeans(n_clusters=n_clusters, n_init=1, random_state=seed).fit(X)
+
+
 class OptimizationAgent:
     """
     Agent 6: Restaurant Optimization Agent using clustering (K-Means) and descriptive analytics.
@@ -13,7 +20,10 @@ class OptimizationAgent:
     """
     
     def __init__(self):
-        self.clustering_model = KMeans(n_clusters=5, random_state=42) # 5 segments as per PDF
+        self.n_clusters = 5 # 5 segments as per PDF
+        self.random_state = 42
+        self.n_init_runs = 10 # Independent K-Means initialisations, run in parallel; best inertia wins
+        self.clustering_model = None # Best of the parallel K-Means runs, set by train()
         self.scaler = StandardScaler()
         self.trained = False
         self.restaurant_clusters = None
@@ -25,19 +35,27 @@ class OptimizationAgent:
         """
         Prepares data for clustering restaurants based on their menu characteristics.
         """
+        # Flag allergens once over the whole menu table (plain substring match, no regex),
+        # so the groupby below only needs built-in sum/mean reductions.
+        # Nullable booleans keep items with missing allergen info out of the percentages.
+        allergen_flags = {
+            'shellfish': '_has_shellfish',
+            'gluten': '_has_gluten',
+            'dairy': '_has_dairy',
+            'peanut': '_has_peanut',
+        }
+        menus = menus.assign(**{
+            col: menus['allergens'].str.contains(allergen, regex=False).astype('boolean')
+            for allergen, col in allergen_flags.items()
+        })
+
         # Aggregate menu stats per restaurant
         agg_menus = menus.groupby('restaurant_id').agg(
             avg_price=('price_myr', 'mean'),
             std_price=('price_myr', 'std'),
             num_items=('menu_id', 'count'),
-            num_shellfish_items=('allergens', lambda x: x.str.contains('shellfish').sum()),
-            num_gluten_items=('allergens', lambda x: x.str.contains('gluten').sum()),
-            num_dairy_items=('allergens', lambda x: x.str.contains('dairy').sum()),
-            num_peanut_items=('allergens', lambda x: x.str.contains('peanut').sum()),
-            pct_shellfish_items=('allergens', lambda x: x.str.contains('shellfish').mean()),
-            pct_gluten_items=('allergens', lambda x: x.str.contains('gluten').mean()),
-            pct_dairy_items=('allergens', lambda x: x.str.contains('dairy').mean()),
-            pct_peanut_items=('allergens', lambda x: x.str.contains('peanut').mean()),
+            **{f'num_{allergen}_items': (col, 'sum') for allergen, col in allergen_flags.items()},
+            **{f'pct_{allergen}_items': (col, 'mean') for allergen, col in allergen_flags.items()},
         ).reset_index()
 
         # Merge with restaurant data
@@ -55,11 +73,17 @@ class OptimizationAgent:
         X = pd.concat([X, cuisine_dummies, price_range_dummies], axis=1)
 
         # Fill NaN values (e.g., std_price for restaurants with 1 item)
-        X = X.fillna(0)
+        # float32 halves the memory of the clustering matrix; K-Means is insensitive to it here
+        X = np.ascontiguousarray(X.fillna(0).to_numpy(dtype=np.float32))
 
-        # Scale features
-        X_scaled = self.scaler.fit_transform(X)
-        return X_scaled, full_data
+        # Scale features: fit the scaler for its statistics, then standardise in place
+        # with the cached mean/scale instead of allocating a transformed copy
+        self.scaler.fit(X)
+        self._mean = self.scaler.mean_.astype(np.float32)
+        self._scale = self.scaler.scale_.astype(np.float32)
+        np.subtract(X, self._mean, out=X)
+        np.divide(X, self._scale, out=X)
+        return X, full_data
 
 
     def train(self, menus: pd.DataFrame, restaurants: pd.DataFrame):
@@ -70,45 +94,63 @@ class OptimizationAgent:
         X_scaled, self.restaurant_data_for_clustering = self._prepare_clustering_data(menus, restaurants)
 
         print("Performing K-Means clustering...")
-        self.restaurant_clusters = self.clustering_model.fit_predict(X_scaled)
+        # Each initialisation is an independent single-threaded fit, so they run one per core
+        # (joblib caps the BLAS/OpenMP threads of each worker to avoid oversubscription)
+        seeds = range(self.random_state, self.random_state + self.n_init_runs)
+        runs = Parallel(n_jobs=-1)(
+            delayed(_fit_kmeans_once)(X_scaled, self.n_clusters, seed) for seed in seeds
+        )
+        self.clustering_model = min(runs, key=lambda model: model.inertia_)
+        self.restaurant_clusters = self.clustering_model.labels_
         self.restaurant_data_for_clustering['cluster'] = self.restaurant_clusters
 
         sil_score = silhouette_score(X_scaled, self.restaurant_clusters)
         print(f"Clustering completed. Number of clusters: {len(np.unique(self.restaurant_clusters))}")
         print(f"Silhouette Score: {sil_score:.3f}")
 
+        # Index by restaurant and precompute per-cluster averages once, so insight lookups
+        # are a single hashed row access instead of DataFrame filters per call
+        self._restaurants_indexed = self.restaurant_data_for_clustering.set_index('restaurant_id')
+        self._cluster_avg_price = (
+            self.restaurant_data_for_clustering.groupby('cluster')['avg_price'].mean()
+            .reindex(range(self.n_clusters)).to_numpy()
+        ) # Indexed by cluster id
+
         self.trained = True
         print("Optimization Agent training completed.\n")
 
 
-    def get_restaurant_insights(self, restaurant_id: str) -> Dict[str, Any]:
+    def get_restaurant_insights(self, restaurant_id: str, menus: Optional[pd.DataFrame] = None) -> Dict[str, Any]:
         """
         Provides insights for a specific restaurant based on clustering and aggregation.
+        `menus` is only used by the untrained fallback, which aggregates the raw menu table.
         """
         if not self.trained:
              # Fallback to simple aggregation if not trained
              print("Warning: Optimization Agent not trained, providing simple aggregations.")
+             if menus is None:
+                 return {'error': 'Optimization Agent not trained and no menu data provided.'}
              rest_menus = menus[menus['restaurant_id'] == restaurant_id]
+             rest_allergens = rest_menus['allergens']
              insights = {
                  'restaurant_id': restaurant_id,
                  'total_menu_items': len(rest_menus),
                  'average_menu_price': rest_menus['price_myr'].mean() if not rest_menus.empty else 0,
-                 'items_with_shellfish': rest_menus['allergens'].str.contains('shellfish').sum() if not rest_menus.empty else 0,
-                 'items_with_gluten': rest_menus['allergens'].str.contains('gluten').sum() if not rest_menus.empty else 0,
-                 'items_with_dairy': rest_menus['allergens'].str.contains('dairy').sum() if not rest_menus.empty else 0,
+                 # One plain substring pass per allergen over the restaurant's items (missing info counts as absent)
+                 **{f'items_with_{allergen}': int(rest_allergens.str.contains(allergen, regex=False, na=False).sum())
+                    for allergen in ('shellfish', 'gluten', 'dairy')},
                  'cluster_assignment': 'Not Available (Model Not Trained)',
                  'cluster_description_approx': 'N/A'
              }
              return insights
 
         # Get data for the specific restaurant
-        rest_row = self.restaurant_data_for_clustering[self.restaurant_data_for_clustering['restaurant_id'] == restaurant_id]
-
-        if rest_row.empty:
+        if restaurant_id not in self._restaurants_indexed.index:
             return {'error': f'Restaurant {restaurant_id} not found in clustering data.'}
 
-        cluster_id = rest_row.iloc[0]['cluster']
-        avg_price_cluster = self.restaurant_data_for_clustering[self.restaurant_data_for_clustering['cluster'] == cluster_id]['avg_price'].mean()
+        rest_row = self._restaurants_indexed.loc[restaurant_id]
+        cluster_id = int(rest_row['cluster'])
+        avg_price_cluster = float(self._cluster_avg_price[cluster_id])
 
         # Describe clusters based on common patterns (this is a simplification)
         cluster_descriptions = {
@@ -125,10 +167,10 @@ class OptimizationAgent:
             'cluster_assignment': int(cluster_id),
             'cluster_description_approx': desc,
             'average_price_in_cluster': avg_price_cluster,
-            'total_menu_items': int(rest_row['num_items'].iloc[0]),
-            'average_menu_price': float(rest_row['avg_price'].iloc[0]),
-            'items_with_shellfish': int(rest_row['num_shellfish_items'].iloc[0]),
-            'items_with_gluten': int(rest_row['num_gluten_items'].iloc[0]),
-            'items_with_dairy': int(rest_row['num_dairy_items'].iloc[0]),
-            'rating': float(rest_row['avg_rating'].iloc[0])
+            'total_menu_items': int(rest_row['num_items']),
+            'average_menu_price': float(rest_row['avg_price']),
+            'items_with_shellfish': int(rest_row['num_shellfish_items']),
+            'items_with_gluten': int(rest_row['num_gluten_items']),
+            'items_with_dairy': int(rest_row['num_dairy_items']),
+            'rating': float(rest_row['avg_rating'])
         }
@@ -1,12 +1,11 @@
 import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split
-from sklearn.ensemble import GradientBoostingRegressor
+from sklearn.ensemble import HistGradientBoostingRegressor
 from sklearn.linear_model import LinearRegression
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 from datetime import datetime, timedelta
-import random
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 class RealTimeAgent:
     """
@@ -15,68 +14,73 @@ class RealTimeAgent:
     """
     
     def __init__(self):
-        # Using Gradient Boosting Regressor as suggested in PDF for wait time prediction
-        self.model = GradientBoostingRegressor(n_estimators=100, max_depth=5, random_state=42)
+        # Using Gradient Boosting as suggested in PDF for wait time prediction.
+        # The histogram-based variant bins features to uint8 and builds histograms in parallel;
+        # day_of_week, is_premium and is_medium use its native categorical splits.
+        self.model = HistGradientBoostingRegressor(
+            max_iter=100, max_depth=5, categorical_features=[2, 7, 8], random_state=42
+        )
         # self.model = LinearRegression() # Alternative simpler model
         self.trained = False
         self.restaurant_avg_rating = {}
         self.restaurant_price_range = {}
+        # Precomputed predictions, filled at the end of train():
+        # _wait_table[restaurant_profile, day_of_week, hour, minute]
+        self._wait_table = None
+        self._wait_table_index = {}
+        self._default_profile_idx = None
 
     def _simulate_wait_data(self, restaurants: pd.DataFrame, num_samples_per_restaurant=50):
         """
         Simulates historical wait time data based on restaurant characteristics and time.
         In a real system, this data comes from live tracking APIs.
         """
-        data = []
-        for _, rest_row in restaurants.iterrows():
-            rest_id = rest_row['restaurant_id']
-            avg_rating = rest_row['avg_rating']
-            price_range = rest_row['price_range']
-            # Store for feature creation later
-            self.restaurant_avg_rating[rest_id] = avg_rating
-            self.restaurant_price_range[rest_id] = price_range
-
-            for _ in range(num_samples_per_restaurant):
-                # Simulate a random time of day
-                hour = random.randint(0, 23)
-                minute = random.randint(0, 59)
-                day_of_week = random.randint(0, 6) # Mon=0, Sun=6
-
-                # Base wait time influenced by rating and price (higher rated/premium might have longer waits)
-                base_wait = 10 # Base
-                base_wait += (avg_rating - 3) * 3 # Higher rating adds wait
-                if price_range == 'Premium': base_wait += 15
-                elif price_range == 'Medium': base_wait += 5
-
-                # Peak hour effect
-                is_lunch = 11 <= hour <= 14
-                is_dinner = 17 <= hour <= 21
-                if is_lunch or is_dinner:
-                    base_wait *= 1.8
-
-                # Weekend effect
-                is_weekend = day_of_week >= 5
-                if is_weekend:
-                    base_wait *= 1.3
-
-                # Add some noise
-                simulated_wait = max(5, base_wait + random.gauss(0, 5)) # Min 5 mins, Gaussian noise
-
-                data.append({
-                    'restaurant_id': rest_id,
-                    'hour': hour,
-                    'minute': minute,
-                    'day_of_week': day_of_week,
-                    'is_lunch': int(is_lunch),
-                    'is_dinner': int(is_dinner),
-                    'is_weekend': int(is_weekend),
-                    'avg_rating': avg_rating,
-                    'is_premium': 1 if price_range == 'Premium' else 0,
-                    'is_medium': 1 if price_range == 'Medium' else 0,
-                    'simulated_actual_wait': simulated_wait
-                })
-
-        return pd.DataFrame(data)
+        # Store for feature creation later
+        self.restaurant_avg_rating.update(zip(restaurants['restaurant_id'], restaurants['avg_rating']))
+        self.restaurant_price_range.update(zip(restaurants['restaurant_id'], restaurants['price_range']))
+
+        # All samples are drawn in one batch: one row per (restaurant, sample)
+        rest_id = np.repeat(restaurants['restaurant_id'].to_numpy(), num_samples_per_restaurant)
+        avg_rating = np.repeat(restaurants['avg_rating'].to_numpy(), num_samples_per_restaurant)
+        price_range = np.repeat(restaurants['price_range'].to_numpy(), num_samples_per_restaurant)
+        num_samples = len(rest_id)
+        rng = np.random.default_rng(42)
+
+        # Simulate a random time of day
+        hour = rng.integers(0, 24, num_samples)
+        minute = rng.integers(0, 60, num_samples)
+        day_of_week = rng.integers(0, 7, num_samples) # Mon=0, Sun=6
+
+        # Base wait time influenced by rating and price (higher rated/premium might have longer waits)
+        is_premium = price_range == 'Premium'
+        is_medium = price_range == 'Medium'
+        base_wait = 10 + (avg_rating - 3) * 3 + np.where(is_premium, 15, np.where(is_medium, 5, 0))
+
+        # Peak hour effect
+        is_lunch = (hour >= 11) & (hour <= 14)
+        is_dinner = (hour >= 17) & (hour <= 21)
+        base_wait = np.where(is_lunch | is_dinner, base_wait * 1.8, base_wait)
+
+        # Weekend effect
+        is_weekend = day_of_week >= 5
+        base_wait = np.where(is_weekend, base_wait * 1.3, base_wait)
+
+        # Add some noise
+        simulated_wait = np.maximum(5, base_wait + rng.normal(0, 5, num_samples)) # Min 5 mins, Gaussian noise
+
+        return pd.DataFrame({
+            'restaurant_id': rest_id,
+            'hour': hour,
+            'minute': minute,
+            'day_of_week': day_of_week,
+            'is_lunch': is_lunch.astype(int),
+            'is_dinner': is_dinner.astype(int),
+            'is_weekend': is_weekend.astype(int),
+            'avg_rating': avg_rating,
+            'is_premium': is_premium.astype(int),
+            'is_medium': is_medium.astype(int),
+            'simulated_actual_wait': simulated_wait
+        })
 
 
     def train(self, restaurants: pd.DataFrame):
@@ -91,7 +95,7 @@ class RealTimeAgent:
 
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
-        print("Training Gradient Boosting Regressor for wait times...")
+        print("Training Histogram Gradient Boosting Regressor for wait times...")
         self.model.fit(X_train, y_train)
 
         # Evaluate on test set
@@ -106,9 +110,45 @@ class RealTimeAgent:
         print(f"R^2 Score: {r2:.2f}")
         print("Real-Time Agent training completed.\n")
 
+        self._build_wait_table()
         self.trained = True
 
 
+    def _build_wait_table(self):
+        """
+        Predicts wait times for every (restaurant profile, day_of_week, hour, minute) in one
+        batched predict call, so get_wait_time is a table lookup. Restaurants only enter the
+        model through (avg_rating, price_range), so the table is built per distinct profile.
+        """
+        default_profile = (4.0, 'Budget') # Used for restaurants not seen in training
+        restaurant_profiles = {
+            rid: (self.restaurant_avg_rating[rid], self.restaurant_price_range[rid]) for rid in self.restaurant_avg_rating
+        }
+        profiles = list(dict.fromkeys([default_profile, *restaurant_profiles.values()]))
+        profile_idx = {profile: i for i, profile in enumerate(profiles)}
+
+        profile, day_of_week, hour, minute = (
+            grid.ravel() for grid in np.meshgrid(np.arange(len(profiles)), np.arange(7), np.arange(24), np.arange(60), indexing='ij')
+        )
+        avg_rating = np.array([rating for rating, _ in profiles])[profile]
+        price_range = np.array([price for _, price in profiles])[profile]
+
+        X_table = pd.DataFrame({
+            'hour': hour,
+            'minute': minute,
+            'day_of_week': day_of_week,
+            'is_lunch': ((hour >= 11) & (hour <= 14)).astype(int),
+            'is_dinner': ((hour >= 17) & (hour <= 21)).astype(int),
+            'is_weekend': (day_of_week >= 5).astype(int),
+            'avg_rating': avg_rating,
+            'is_premium': (price_range == 'Premium').astype(int),
+            'is_medium': (price_range == 'Medium').astype(int),
+        })
+        self._wait_table = self.model.predict(X_table).reshape(len(profiles), 7, 24, 60)
+        self._default_profile_idx = profile_idx[default_profile]
+        self._wait_table_index = {rid: profile_idx[p] for rid, p in restaurant_profiles.items()}
+
+
     def get_wait_time(self, restaurant_id: str, current_datetime: datetime = None) -> Dict[str, Any]:
         """
         Predicts wait time for a restaurant at a given time using the trained model.
@@ -125,21 +165,9 @@ class RealTimeAgent:
         if current_datetime is None:
             current_datetime = datetime.now()
 
-        # Prepare features for prediction
-        X_pred = pd.DataFrame([{
-            'hour': current_datetime.hour,
-            'minute': current_datetime.minute,
-            'day_of_week': current_datetime.weekday(),
-            'is_lunch': 1 if 11 <= current_datetime.hour <= 14 else 0,
-            'is_dinner': 1 if 17 <= current_datetime.hour <= 21 else 0,
-            'is_weekend': 1 if current_datetime.weekday() >= 5 else 0,
-            'avg_rating': self.restaurant_avg_rating.get(restaurant_id, 4.0), # Default rating
-            'is_premium': 1 if self.restaurant_price_range.get(restaurant_id, 'Budget') == 'Premium' else 0,
-            'is_medium': 1 if self.restaurant_price_range.get(restaurant_id, 'Budget') == 'Medium' else 0,
-        }])
-
-        # Predict
-        predicted_wait = self.model.predict(X_pred)[0]
+        # Table lookup of the precomputed model prediction
+        profile_idx = self._wait_table_index.get(restaurant_id, self._default_profile_idx)
+        predicted_wait = self._wait_table[profile_idx, current_datetime.weekday(), current_datetime.hour, current_datetime.minute]
         predicted_wait = max(5, predicted_wait) # Ensure minimum wait time
 
         return {
@@ -148,3 +176,19 @@ class RealTimeAgent:
             'prediction_timestamp': current_datetime.isoformat(),
             'data_source': 'ml_model_prediction'
         }
+
+
+    def get_wait_times(self, restaurant_ids: List[str], current_datetime: datetime = None) -> np.ndarray:
+        """
+        Predicts wait times (minutes) for many restaurants at the same time in one vectorised lookup,
+        e.g. when ranking restaurants for a user session.
+        """
+        if not self.trained:
+            return np.array([self.get_wait_time(rid, current_datetime)['estimated_wait_minutes'] for rid in restaurant_ids])
+
+        if current_datetime is None:
+            current_datetime = datetime.now()
+
+        profile_idx = np.array([self._wait_table_index.get(rid, self._default_profile_idx) for rid in restaurant_ids], dtype=np.intp)
+        predicted_waits = self._wait_table[profile_idx, current_datetime.weekday(), current_datetime.hour, current_datetime.minute]
+        return np.maximum(5, predicted_waits).astype(int) # Ensure minimum wait time; truncated like get_wait_time
@@ -4,6 +4,7 @@ from lightfm import LightFM
 from lightfm.data import Dataset
 from scipy.sparse import csr_matrix
 from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.preprocessing import MultiLabelBinarizer
 from sklearn.metrics.pairwise import cosine_similarity
 import pickle
 from typing import Dict, Any, List
@@ -63,63 +64,54 @@ class RecommendationAgent:
             user_features_raw.append(list(feats))
 
         # --- Create item features ---
-        # First, merge menu with restaurant for halal info
-        menus_with_rest = menus.merge(restaurants[['restaurant_id', 'halal_certified']], on='restaurant_id', how='left')
-        item_features_raw = []
-        for _, row in menus_with_rest.iterrows():
-            feats = set()
-            # Cuisine type
-            cuisine_clean = row['cuisine_type'].lower().replace(' ', '_')
-            feats.add(f'cuisine_{cuisine_clean}')
-            # Allergens
-            for allergen in row['allergens'].split('_'):
-                if allergen != 'none': # Exclude 'none' as a feature
-                    feats.add(f'allergen_{allergen}')
-                else:
-                    feats.add('allergen_none')
-            # Halal status
-            halal_status = row['halal_certified'].lower()
-            feats.add(f'halal_{halal_status}')
-            item_features_raw.append(list(feats))
+        # First, merge menu with restaurant for halal info and cuisine type
+        menus_with_rest = menus.merge(restaurants[['restaurant_id', 'halal_certified', 'cuisine_type']], on='restaurant_id', how='left')
+        # Feature strings are built column-wise; only the final per-item lists are assembled in Python
+        cuisine_feats = ('cuisine_' + menus_with_rest['cuisine_type'].str.lower().str.replace(' ', '_', regex=False)).tolist()
+        halal_feats = ('halal_' + menus_with_rest['halal_certified'].str.lower()).tolist()
+        menu_alls = menus_with_rest['allergens'].fillna('none').str.split('_')
+        item_features_raw = [
+            # dict.fromkeys de-duplicates while keeping order ('none' maps to 'allergen_none')
+            list(dict.fromkeys([cuisine, halal] + [f'allergen_{allergen}' for allergen in allergens]))
+            for cuisine, halal, allergens in zip(cuisine_feats, halal_feats, menu_alls)
+        ]
 
         # Build interaction matrix (simulated implicit feedback)
-        interactions_data = []
-        for u_idx, (_, user_row) in enumerate(user_profiles.iterrows()):
-            for i_idx, (_, menu_row) in enumerate(menus_with_rest.iterrows()):
-                # Simulate interaction strength based on compatibility
-                strength = 1.0 # Base strength
-                # Reduce strength if dietary mismatch
-                if 'halal' in user_row['dietary_restrictions'] and menu_row['halal_certified'] != 'Yes':
-                    strength *= 0.1 # Low interest if not halal for halal user
-                # Reduce strength if outside budget
-                min_budget, max_budget = map(int, user_row['budget_range_myr'].split('-'))
-                if not (min_budget <= menu_row['price_myr'] <= max_budget):
-                    strength *= 0.1 # Low interest if outside budget
-                # Reduce strength if allergen conflict
-                user_alls = set(user_row['allergies'].split('_'))
-                menu_alls = set(menu_row['allergens'].split('_'))
-                if user_alls.intersection(menu_alls):
-                    strength = 0.0 # No interaction if allergen conflict
-                
-                if strength > 0:
-                    interactions_data.append((u_idx, i_idx, strength))
-
-        if not interactions_data:
+        # The compatibility rules are encoded as per-user and per-menu arrays and
+        # evaluated for every (user, menu) pair at once via broadcasting.
+        user_wants_halal = user_profiles['dietary_restrictions'].str.contains('halal', regex=False).to_numpy()
+        user_budget = user_profiles['budget_range_myr'].str.split('-', expand=True).astype(int).to_numpy()
+        menu_is_halal = (menus_with_rest['halal_certified'] == 'Yes').to_numpy()
+        menu_price = menus_with_rest['price_myr'].to_numpy()
+
+        strength = np.ones((len(user_profiles), len(menus_with_rest)), dtype=np.float32) # Base strength
+        # Reduce strength if dietary mismatch (low interest if not halal for halal user)
+        strength[np.outer(user_wants_halal, ~menu_is_halal)] *= 0.1
+        # Reduce strength if outside budget
+        within_budget = (user_budget[:, [0]] <= menu_price) & (menu_price <= user_budget[:, [1]])
+        strength[~within_budget] *= 0.1
+        # No interaction if allergen conflict (any shared allergy/allergen token)
+        user_alls = user_profiles['allergies'].str.split('_')
+        allergen_encoder = MultiLabelBinarizer().fit(pd.concat([user_alls, menu_alls]))
+        allergen_conflict = (allergen_encoder.transform(user_alls) @ allergen_encoder.transform(menu_alls).T) > 0
+        strength[allergen_conflict] = 0.0
+
+        # Only surviving (strength > 0) pairs become COO entries; no Python-level triples
+        user_indices, item_indices = np.nonzero(strength)
+        if len(user_indices) == 0:
             raise ValueError("No valid interactions generated. Check user/menu compatibility logic.")
 
-        user_ids_internal, item_ids_internal, weights = zip(*interactions_data)
-        user_map, item_map = self.dataset.mapping()[0], self.dataset.mapping()[1]
+        # mapping() returns (user_id_map, user_feature_map, item_id_map, item_feature_map)
+        user_map, item_map = self.dataset.mapping()[0], self.dataset.mapping()[2]
         self.user_mapping = {uid: internal_id for uid, internal_id in user_map.items()}
         self.item_mapping = {iid: internal_id for iid, internal_id in item_map.items()}
 
         # Create CSR interaction matrix
-        coo_interactions = np.array(interactions_data).T
-        user_indices = coo_interactions[0]
-        item_indices = coo_interactions[1]
-        data = coo_interactions[2]
         num_users = len(user_map)
         num_items = len(item_map)
-        interactions_matrix = csr_matrix((data, (user_indices, item_indices)), shape=(num_users, num_items))
+        interactions_matrix = csr_matrix(
+            (strength[user_indices, item_indices], (user_indices, item_indices)), shape=(num_users, num_items)
+        )
 
         # Build feature matrices
         self.user_features = self.dataset.build_user_features([(uid, feats) for uid, feats in zip(user_ids, user_features_raw)])
@@ -138,6 +130,25 @@ class RecommendationAgent:
         print("Training LightFM model...")
         self.model.fit(interactions, user_features=self.user_features, item_features=self.item_features, epochs=50, verbose=True)
 
+        # Cache latent representations for scoring. With item rows [embedding, bias, 1] and
+        # user rows [embedding, 1, bias], a plain inner product equals LightFM's score, so
+        # recommend() becomes a maximum-inner-product search over the item matrix.
+        # Everything is kept in float32 (LightFM's own precision) so scoring moves half the bytes.
+        user_biases, user_embeddings = self.model.get_user_representations(self.user_features)
+        item_biases, item_embeddings = self.model.get_item_representations(self.item_features)
+        self._user_vectors = np.hstack([
+            user_embeddings, np.ones((len(user_biases), 1), dtype=np.float32), user_biases[:, None]
+        ]).astype(np.float32)
+        self._item_vectors = np.hstack([
+            item_embeddings, item_biases[:, None], np.ones((len(item_biases), 1), dtype=np.float32)
+        ]).astype(np.float32)
+
+        # Reverse item mapping (internal id -> menu_id) and a menu_id-indexed table, built once
+        self._item_id_array = np.empty(len(self.item_mapping), dtype=object)
+        for menu_id, internal_id in self.item_mapping.items():
+            self._item_id_array[internal_id] = menu_id
+        self._menus_indexed = menus.set_index('menu_id')
+
         self.trained = True
         print("Recommendation Agent training completed.\n")
 
@@ -155,26 +166,27 @@ class RecommendationAgent:
 
         user_internal_id = self.user_mapping[user_id]
         # Get scores for all items for this user
-        scores = self.model.predict(user_internal_id, np.arange(len(self.item_mapping)), user_features=self.user_features, item_features=self.item_features)
+        scores = self._item_vectors @ self._user_vectors[user_internal_id]
 
-        # Get top N item indices based on score
-        top_item_internal_ids = np.argsort(-scores)[:num_recommendations]
+        # Get top N item indices based on score: partial selection, then sort only those N
+        k = min(num_recommendations, len(scores))
+        top_item_internal_ids = np.argpartition(-scores, k - 1)[:k]
+        top_item_internal_ids = top_item_internal_ids[np.argsort(-scores[top_item_internal_ids])]
 
         # Map back to original item IDs
-        id_map_inv = {v: k for k, v in self.item_mapping.items()} # Invert item mapping
-        recommended_menu_ids = [id_map_inv[iid] for iid in top_item_internal_ids]
+        recommended_menu_ids = self._item_id_array[top_item_internal_ids].tolist()
 
-        # Fetch details from original menus DataFrame
+        # Fetch details from the menu_id-indexed menus table
         # This is a simple lookup; in a real system, you'd want to join with restaurant data too.
         recommendations = []
-        for mid in recommended_menu_ids:
-             menu_row = menus[menus['menu_id'] == mid].iloc[0]
+        for iid, mid in zip(top_item_internal_ids, recommended_menu_ids):
+             menu_row = self._menus_indexed.loc[mid]
              recommendations.append({
-                 'menu_id': menu_row['menu_id'],
+                 'menu_id': mid,
                  'restaurant_id': menu_row['restaurant_id'],
                  'dish_name': menu_row['dish_name'],
                  'price_myr': menu_row['price_myr'],
-                 'predicted_score': scores[self.item_mapping[mid]] # Include model score
+                 'predicted_score': scores[iid] # Include model score
              })
 
         return recommendations
@@ -1,16 +1,19 @@
 import pandas as pd
-from textblob import TextBlob
+from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+import ahocorasick
 from typing import Dict, Any, List
 import re
 
 class ReviewAnalysisAgent:
     """
     Agent 4: Review & Sentiment Analysis Agent.
-    Uses TextBlob for basic sentiment analysis and custom keyword matching for safety signals.
+    Uses VADER for lexicon-based sentiment analysis and custom keyword matching for safety signals.
     (Note: For production, BERT/RoBERTa from PDF would be preferred)
     """
     
     def __init__(self):
+        # VADER is a pure lexicon lookup, so one analyzer instance is shared across reviews
+        self.sentiment_analyzer = SentimentIntensityAnalyzer()
         # Keywords for safety signals, as mentioned in PDF
         self.safety_keywords = [
             'cross-contamination', 'contamination', 'felt sick', 'made me sick', 'sick',
@@ -21,33 +24,54 @@ class ReviewAnalysisAgent:
         self.allergen_keywords = [
             'shellfish', 'gluten', 'dairy', 'egg', 'peanut', 'tree nut', 'soy', 'sesame'
         ]
+        # Single Aho-Corasick automaton over both keyword lists, so each review
+        # is matched in one pass over the text (overlapping keywords included)
+        self._keyword_automaton = ahocorasick.Automaton()
+        for category, keywords in (('safety', self.safety_keywords), ('allergen', self.allergen_keywords)):
+            for keyword in keywords:
+                self._keyword_automaton.add_word(keyword, (category, keyword))
+        self._keyword_automaton.make_automaton()
 
 
     def analyze_review(self, review_text: str) -> Dict[str, Any]:
         """
         Analyzes a review text for sentiment and safety signals.
         """
-        # 1. Sentiment Analysis using TextBlob
-        blob = TextBlob(review_text)
-        polarity = blob.sentiment.polarity # -1 (neg) to 1 (pos)
-        subjectivity = blob.sentiment.subjectivity # 0 (obj) to 1 (subj)
+        return self._analyze(review_text, review_text.lower())
 
-        if polarity > 0.1: sentiment_label = 'POSITIVE'
-        elif polarity < -0.1: sentiment_label = 'NEGATIVE'
+
+    def analyze_batch(self, review_texts: List[str]) -> List[Dict[str, Any]]:
+        """
+        Analyzes a batch of review texts, e.g. a review stream.
+        Returns one result dict per review, in input order.
+        """
+        texts_lower = [text.lower() for text in review_texts]
+        return [self._analyze(text, text_lower) for text, text_lower in zip(review_texts, texts_lower)]
+
+
+    def _analyze(self, review_text: str, text_lower: str) -> Dict[str, Any]:
+        """
+        Shared analysis for one review; `text_lower` is only used for keyword matching,
+        VADER scores the original text since it uses capitalization as an intensity cue.
+        """
+        # 1. Sentiment Analysis using VADER
+        scores = self.sentiment_analyzer.polarity_scores(review_text)
+        polarity = scores['compound'] # -1 (neg) to 1 (pos)
+        subjectivity = 1.0 - scores['neu'] # Share of sentiment-bearing text, 0 (obj) to 1 (subj)
+
+        # Standard VADER thresholds on the compound score
+        if polarity >= 0.05: sentiment_label = 'POSITIVE'
+        elif polarity <= -0.05: sentiment_label = 'NEGATIVE'
         else: sentiment_label = 'NEUTRAL'
 
         # 2. Safety Signal Detection
-        found_safety_signals = []
-        found_allergens_mentioned = []
-        text_lower = review_text.lower()
-
-        for signal in self.safety_keywords:
-            if signal in text_lower:
-                found_safety_signals.append(signal)
+        found = {'safety': set(), 'allergen': set()}
+        for _, (category, keyword) in self._keyword_automaton.iter(text_lower):
+            found[category].add(keyword)
 
-        for allergen in self.allergen_keywords:
-            if allergen in text_lower:
-                found_allergens_mentioned.append(allergen)
+        # Report matches in keyword-list order
+        found_safety_signals = [signal for signal in self.safety_keywords if signal in found['safety']]
+        found_allergens_mentioned = [allergen for allergen in self.allergen_keywords if allergen in found['allergen']]
 
         # 3. Determine if requires attention
         requires_attention = len(found_safety_signals) > 0
@@ -61,5 +85,5 @@ class ReviewAnalysisAgent:
             'safety_signals_found': found_safety_signals,
             'allergens_mentioned_in_text': found_allergens_mentioned,
             'requires_attention': requires_attention,
-            'analysis_confidence_approx': 0.7 # Approximate, TextBlob is rule-based
+            'analysis_confidence_approx': 0.7 # Approximate, VADER is rule-based
         }
@@ -6,8 +6,9 @@ from sklearn.preprocessing import LabelEncoder, MultiLabelBinarizer
 from sklearn.metrics import classification_report, confusion_matrix
 import xgboost as xgb
 import joblib
+import os
 import re
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 
 class SafetyAgent:
     """
@@ -23,12 +24,22 @@ class SafetyAgent:
             max_depth=6,
             learning_rate=0.1,
             scale_pos_weight=50, # Approximate imbalance: 2-7% alerts vs 93-98% safe (from PDF)
+            n_jobs=os.cpu_count(), # All cores for training; prediction is switched to 1 thread after train()
+            # Histogram method (required for native categorical splits); set XGB_TREE_METHOD=gpu_hist to train on a GPU
+            tree_method=os.environ.get('XGB_TREE_METHOD', 'hist'),
+            max_bin=256,
+            grow_policy='depthwise',
+            enable_categorical=True, # cuisine is passed as a pandas categorical instead of an ordinal code
             random_state=42
         )
         self.user_allergies_encoder = MultiLabelBinarizer()
         self.menu_allergens_encoder = MultiLabelBinarizer()
         self.health_conditions_encoder = MultiLabelBinarizer()
         self.cuisine_encoder = LabelEncoder()
+        self.feature_names = [] # Training feature matrix columns, set in _preprocess_data
+        self._feat_index = {}
+        self._cuisine_index = {}
+        self._booster = None
         self.trained = False
         # Add a fallback flag in case training fails critically
         self.fallback_active = False 
@@ -42,81 +53,130 @@ class SafetyAgent:
         return str(x).split('_') if str(x) != 'none' else []
 
 
+    def _encoded_column(self, encoded: np.ndarray, encoder: MultiLabelBinarizer, token: str) -> np.ndarray:
+        """
+        Returns the boolean indicator column for `token` from a binarized matrix (all False if unseen).
+        """
+        matches = np.flatnonzero(encoder.classes_ == token)
+        if len(matches) == 0:
+            return np.zeros(len(encoded), dtype=bool)
+        return encoded[:, matches[0]].astype(bool)
+
+
     def _preprocess_data(self, user_profiles: pd.DataFrame, menus: pd.DataFrame, restaurants: pd.DataFrame):
         """
         Creates a merged dataset for training the safety classifier.
         Target variable: 1 if unsafe (alert), 0 if safe.
         """
-        # Merge user and menu data
-        full_data = user_profiles.assign(key=1).merge(menus.assign(key=1), on='key').drop('key', axis=1)
-        
-        # Merge with restaurants for cuisine type
-        full_data = full_data.merge(restaurants[['restaurant_id', 'cuisine_type']], on='restaurant_id', how='left')
+        # Merge menus with restaurants for cuisine type
+        menus = menus.merge(restaurants[['restaurant_id', 'cuisine_type']], on='restaurant_id', how='left')
+
+        # Every user is paired with every menu item (user-major order). Instead of materialising the
+        # wide user x menu cross join, only the narrow per-user and per-menu columns are parsed and
+        # encoded; pairs are formed by broadcasting (labels) or repeat/tile (features).
+        n_users, n_menus = len(user_profiles), len(menus)
 
         # --- Feature Engineering ---
         # 1. Parse user allergies and health conditions (assuming '_' separation)
-        full_data['user_allergies_list'] = full_data['allergies'].apply(self._safe_split)
-        full_data['health_conditions_list'] = full_data['health_conditions'].apply(self._safe_split)
+        user_allergies_list = user_profiles['allergies'].apply(self._safe_split)
+        health_conditions_list = user_profiles['health_conditions'].apply(self._safe_split)
 
         # 2. Parse menu allergens
-        full_data['menu_allergens_list'] = full_data['allergens'].apply(self._safe_split)
+        menu_allergens_list = menus['allergens'].apply(self._safe_split)
+
+        # Encode categorical features (one row per user / per menu item)
+        user_allergies_encoded = self.user_allergies_encoder.fit_transform(user_allergies_list)
+        menu_allergens_encoded = self.menu_allergens_encoder.fit_transform(menu_allergens_list)
+        health_conditions_encoded = self.health_conditions_encoder.fit_transform(health_conditions_list)
+        cuisine_encoded = self.cuisine_encoder.fit_transform(menus['cuisine_type'])
 
         # 3. Create target variable based on allergen/condition overlap (this is a proxy, a real system needs confirmed labels)
         # For demo, let's assume an item is unsafe if there's an exact match in allergens or a known health condition conflict
         # (e.g., gluten for celiac, shellfish for shellfish allergy)
         # Also consider 'POTENTIAL_RISK' safety_status as unsafe for training purposes.
-        
-        def is_unsafe(row):
-            user_alls = set(row['user_allergies_list'])
-            menu_alls = set(row['menu_allergens_list'])
-            user_health = set(row['health_conditions_list'])
-            
-            # Check allergen overlap
-            if user_alls.intersection(menu_alls):
-                return 1
-            
-            # Check health condition conflicts (simplified)
-            if 'celiac_disease' in user_health and 'gluten' in menu_alls:
-                return 1
-            # Note: More complex checks for diabetes/hypertension require nutritional data not in the provided menu.csv
-            # Example: if 'diabetes' in user_health and 'sugar' in row['ingredients_clean'].lower(): 
-            #      return 1
-            # Example: if 'hypertension' in user_health and 'salt' in row['ingredients_clean'].lower(): 
-            #      return 1
-                 
-            # Check for potential risk status
-            if row['safety_status'] == 'POTENTIAL_RISK':
-                return 1
-                
-            return 0
-
-        full_data['target_is_unsafe'] = full_data.apply(is_unsafe, axis=1)
-
-        # Drop rows where target is unknown or invalid (if any logic errors occur)
-        # full_data = full_data.dropna(subset=['target_is_unsafe']) # This shouldn't be necessary if is_unsafe always returns 0 or 1
-
-        # Encode categorical features
-        user_allergies_encoded = self.user_allergies_encoder.fit_transform(full_data['user_allergies_list'])
-        menu_allergens_encoded = self.menu_allergens_encoder.fit_transform(full_data['menu_allergens_list'])
-        health_conditions_encoded = self.health_conditions_encoder.fit_transform(full_data['health_conditions_list'])
-        cuisine_encoded = self.cuisine_encoder.fit_transform(full_data['cuisine_type'])
-
-        # Create feature matrix X
-        X = pd.DataFrame(user_allergies_encoded, columns=self.user_allergies_encoder.classes_)
-        X = pd.concat([X, pd.DataFrame(menu_allergens_encoded, columns=self.menu_allergens_encoder.classes_)], axis=1)
-        X = pd.concat([X, pd.DataFrame(health_conditions_encoded, columns=self.health_conditions_encoder.classes_)], axis=1)
-        X['cuisine_encoded'] = cuisine_encoded
-        X['budget_min'] = full_data['budget_range_myr'].str.split('-').apply(lambda x: int(x[0]))
-        X['budget_max'] = full_data['budget_range_myr'].str.split('-').apply(lambda x: int(x[1]))
-        X['price'] = full_data['price_myr']
-        # Feature for missing ingredient/allergen data (critical for safety)
-        X['missing_allergen_info'] = (full_data['allergens'].isna()) | (full_data['allergens'] == '') | (full_data['allergens'] == 'none')
+        # The rules are evaluated on the binarized matrices as (n_users, n_menus) grids, then flattened.
 
-        y = full_data['target_is_unsafe']
+        # Check allergen overlap: compare the columns of tokens known to both encoders
+        _, user_cols, menu_cols = np.intersect1d(
+            self.user_allergies_encoder.classes_, self.menu_allergens_encoder.classes_, return_indices=True
+        )
+        # Each row's shared tokens are packed into a bitmask (8 tokens per byte), so a user/menu overlap
+        # test is a bytewise AND instead of an integer matrix product
+        user_masks = np.packbits(user_allergies_encoded[:, user_cols].astype(bool), axis=1)
+        menu_masks = np.packbits(menu_allergens_encoded[:, menu_cols].astype(bool), axis=1)
+        allergen_overlap = (user_masks[:, None, :] & menu_masks[None, :, :]).any(axis=2)
+
+        # Check health condition conflicts (simplified)
+        has_celiac = self._encoded_column(health_conditions_encoded, self.health_conditions_encoder, 'celiac_disease')
+        has_gluten = self._encoded_column(menu_allergens_encoded, self.menu_allergens_encoder, 'gluten')
+        # Note: More complex checks for diabetes/hypertension require nutritional data not in the provided menu.csv
+        # Example: diabetes + 'sugar' in ingredients_clean, hypertension + 'salt' in ingredients_clean
+
+        # Check for potential risk status
+        potential_risk = (menus['safety_status'] == 'POTENTIAL_RISK').to_numpy()
+
+        is_unsafe = allergen_overlap | np.outer(has_celiac, has_gluten) | potential_risk
+        y = pd.Series(is_unsafe.ravel().astype(int), name='target_is_unsafe')
+
+        # Feature names are prefixed per block: the same token (e.g. 'dairy') can be both a user allergy
+        # and a menu allergen, and XGBoost requires unique feature names
+        self.feature_names = (
+            [f'user_allergy_{c}' for c in self.user_allergies_encoder.classes_]
+            + [f'menu_allergen_{c}' for c in self.menu_allergens_encoder.classes_]
+            + [f'health_{c}' for c in self.health_conditions_encoder.classes_]
+            + ['cuisine_encoded', 'budget_min', 'budget_max', 'price', 'missing_allergen_info']
+        )
+        # Lookups used to encode single rows for prediction without going through pandas/sklearn
+        self._feat_index = {name: i for i, name in enumerate(self.feature_names)}
+        self._cuisine_index = {cuisine: i for i, cuisine in enumerate(self.cuisine_encoder.classes_)}
+
+        # Create feature matrix X (user features repeated per menu item, menu features tiled per user)
+        budget = user_profiles['budget_range_myr'].str.split('-', n=1, expand=True).astype(np.int32).to_numpy()
+        # Feature for missing ingredient/allergen data (critical for safety)
+        missing_allergen_info = (menus['allergens'].isna()) | (menus['allergens'] == '') | (menus['allergens'] == 'none')
+        X = self._build_feature_matrix(
+            np.repeat(user_allergies_encoded, n_menus, axis=0),
+            np.tile(menu_allergens_encoded, (n_users, 1)),
+            np.repeat(health_conditions_encoded, n_menus, axis=0),
+            np.tile(cuisine_encoded, n_users),
+            np.repeat(budget[:, 0], n_menus),
+            np.repeat(budget[:, 1], n_menus),
+            np.tile(menus['price_myr'].to_numpy(), n_users),
+            np.tile(missing_allergen_info.to_numpy(), n_users),
+        )
 
         return X, y
 
 
+    def _cuisine_codes(self, cuisine_types: pd.Series) -> np.ndarray:
+        """
+        Category codes of the cuisines as seen in training; -1 for a cuisine unseen in training (missing category).
+        """
+        return cuisine_types.map(self._cuisine_index).fillna(-1).to_numpy(dtype=int)
+
+    def _build_feature_matrix(self, user_allergies_encoded, menu_allergens_encoded, health_conditions_encoded,
+                              cuisine_encoded, budget_min, budget_max, price, missing_allergen_info) -> pd.DataFrame:
+        """
+        Writes the feature blocks into one pre-allocated matrix, in the column order of self.feature_names.
+        """
+        blocks = [user_allergies_encoded, menu_allergens_encoded, health_conditions_encoded]
+        columns = [cuisine_encoded, budget_min, budget_max, price, missing_allergen_info]
+        X = np.empty((len(cuisine_encoded), len(self.feature_names)), dtype=np.float32)
+        col = 0
+        for block in blocks:
+            X[:, col:col + block.shape[1]] = block
+            col += block.shape[1]
+        for values in columns:
+            X[:, col] = values
+            col += 1
+        X = pd.DataFrame(X, columns=self.feature_names)
+        # Cuisine codes become a categorical column, so XGBoost splits on cuisine sets rather than code order
+        X['cuisine_encoded'] = pd.Categorical.from_codes(
+            X['cuisine_encoded'].to_numpy(dtype=int), categories=self.cuisine_encoder.classes_
+        )
+        return X
+
+
     def train(self, user_profiles: pd.DataFrame, menus: pd.DataFrame, restaurants: pd.DataFrame):
         """
         Trains the XGBoost model on the provided datasets.
@@ -158,11 +218,57 @@ class SafetyAgent:
         print(classification_report(y_test, y_pred))
         print(confusion_matrix(y_test, y_pred))
         
+        # Predictions go straight to the booster: inplace_predict takes arrays directly (no DMatrix
+        # conversion) and one call yields P(unsafe), from which the class follows
+        self._booster = self.model.get_booster()
+        # Predictions are a handful of rows, where extra threads only add overhead (and oversubscribe
+        # the machine when several agents/processes predict at once)
+        self.model.set_params(n_jobs=1)
+        self._booster.set_param({'nthread': 1})
+
         self.trained = True
         self.fallback_active = False
         print("Safety Agent training completed.\n")
 
 
+    def save(self, path: str):
+        """
+        Saves the trained model and fitted encoders, so later sessions can load them instead of retraining.
+        """
+        if not self.trained:
+            raise ValueError("Safety Agent must be trained before saving.")
+        joblib.dump({
+            'model': self.model,
+            'user_allergies_encoder': self.user_allergies_encoder,
+            'menu_allergens_encoder': self.menu_allergens_encoder,
+            'health_conditions_encoder': self.health_conditions_encoder,
+            'cuisine_encoder': self.cuisine_encoder,
+            'feature_names': self.feature_names,
+            'feat_index': self._feat_index,
+            'cuisine_index': self._cuisine_index,
+        }, path, compress=3)
+
+
+    @classmethod
+    def load(cls, path: str) -> 'SafetyAgent':
+        """
+        Loads a trained Safety Agent saved with save().
+        """
+        state = joblib.load(path)
+        agent = cls()
+        agent.model = state['model']
+        agent.user_allergies_encoder = state['user_allergies_encoder']
+        agent.menu_allergens_encoder = state['menu_allergens_encoder']
+        agent.health_conditions_encoder = state['health_conditions_encoder']
+        agent.cuisine_encoder = state['cuisine_encoder']
+        agent.feature_names = state['feature_names']
+        agent._feat_index = state['feat_index']
+        agent._cuisine_index = state['cuisine_index']
+        agent._booster = agent.model.get_booster()
+        agent.trained = True
+        return agent
+
+
     def _preprocess_single_input(self, user_profile: pd.Series, menu_item: pd.Series, restaurant: pd.Series):
         """
         Preprocesses a single user-menu pair for prediction.
@@ -171,90 +277,47 @@ class SafetyAgent:
             # This function should not be called if not trained, but handle gracefully
             return None
 
-        # Create a temporary dataframe row similar to training
-        temp_row = pd.DataFrame({
-            'allergies': [user_profile['allergies']],
-            'health_conditions': [user_profile['health_conditions']],
-            'allergens': [menu_item['allergens']],
-            'cuisine_type': [restaurant['cuisine_type']],
-            'budget_range_myr': [user_profile['budget_range_myr']],
-            'price_myr': [menu_item['price_myr']],
-            'ingredients_clean': [menu_item['ingredients_clean']],
-            'safety_status': [menu_item['safety_status']]
-        })
-
-        # Parse lists using the safe function
-        temp_row['user_allergies_list'] = temp_row['allergies'].apply(self._safe_split)
-        temp_row['health_conditions_list'] = temp_row['health_conditions'].apply(self._safe_split)
-        temp_row['menu_allergens_list'] = temp_row['allergens'].apply(self._safe_split)
-
-        # Encode features
-        user_allergies_encoded = self.user_allergies_encoder.transform(temp_row['user_allergies_list'])
-        menu_allergens_encoded = self.menu_allergens_encoder.transform(temp_row['menu_allergens_list'])
-        health_conditions_encoded = self.health_conditions_encoder.transform(temp_row['health_conditions_list'])
-        cuisine_encoded = self.cuisine_encoder.transform(temp_row['cuisine_type'])
-
-        X_single = pd.DataFrame(user_allergies_encoded, columns=self.user_allergies_encoder.classes_)
-        X_single = pd.concat([X_single, pd.DataFrame(menu_allergens_encoded, columns=self.menu_allergens_encoder.classes_)], axis=1)
-        X_single = pd.concat([X_single, pd.DataFrame(health_conditions_encoded, columns=self.health_conditions_encoder.classes_)], axis=1)
-        X_single['cuisine_encoded'] = cuisine_encoded
-        X_single['budget_min'] = temp_row['budget_range_myr'].str.split('-').apply(lambda x: int(x[0]))
-        X_single['budget_max'] = temp_row['budget_range_myr'].str.split('-').apply(lambda x: int(x[1]))
-        X_single['price'] = temp_row['price_myr']
-        X_single['missing_allergen_info'] = (temp_row['allergens'].isna()) | (temp_row['allergens'] == '') | (temp_row['allergens'] == 'none')
-
-        # Ensure columns match training data (fill missing with 0)
-        # Get the feature names from the trained model booster
-        expected_feature_names = self.model._Booster.feature_names
-        for col in expected_feature_names:
-             if col not in X_single.columns:
-                 X_single[col] = 0
-        X_single = X_single.reindex(columns=expected_feature_names, fill_value=0)
-
-        return X_single
+        # The row is written straight into a feature vector: each token present sets its training column
+        x = np.zeros(len(self.feature_names), dtype=np.float32)
+        for prefix, value in (('user_allergy_', user_profile['allergies']),
+                              ('menu_allergen_', menu_item['allergens']),
+                              ('health_', user_profile['health_conditions'])):
+            for token in self._safe_split(value):
+                col = self._feat_index.get(prefix + token) # Tokens unseen in training are ignored
+                if col is not None:
+                    x[col] = 1.0
+
+        budget_min, budget_max = user_profile['budget_range_myr'].split('-', 1)
+        allergens = menu_item['allergens']
+        cuisine_code = self._cuisine_codes(pd.Series([restaurant['cuisine_type']]))[0]
+        # An unseen cuisine (-1) is a missing category, as in the batch matrix
+        x[self._feat_index['cuisine_encoded']] = cuisine_code if cuisine_code >= 0 else np.nan
+        x[self._feat_index['budget_min']] = int(budget_min)
+        x[self._feat_index['budget_max']] = int(budget_max)
+        x[self._feat_index['price']] = menu_item['price_myr']
+        x[self._feat_index['missing_allergen_info']] = pd.isna(allergens) or allergens == '' or allergens == 'none'
+
+        return x.reshape(1, -1)
 
 
     def check_safety(self, user_profile: pd.Series, menu_item: pd.Series, restaurant: pd.Series) -> Dict[str, Any]:
         """
         Evaluates if a menu item is safe for a user using the trained model or rules.
         """
+        # Parse the token lists once; every rule below works on these
+        user_alls_list = self._safe_split(user_profile['allergies'])
+        menu_alls_list = self._safe_split(menu_item['allergens'])
+        user_health_list = self._safe_split(user_profile['health_conditions'])
+
         # --- Fallback to Rule-Based if Model Not Trained Properly ---
         if not self.trained or self.fallback_active:
             print("Warning: Safety Agent not fully trained, using rule-based checks.")
-            # Basic check for missing allergens (critical safety rule)
-            if pd.isna(menu_item['allergens']) or menu_item['allergens'].strip() == '':
-                return {
-                    'safe': False,
-                    'reason': 'MISSING_ALLERGEN_INFO_FALLBACK (Critical Safety Rule)',
-                    'risk_level': 'HIGH',
-                    'model_confidence': None
-                }
-            # Basic check for direct allergen match (critical safety rule)
-            user_alls_list = self._safe_split(user_profile['allergies'])
-            menu_alls_list = self._safe_split(menu_item['allergens']) # Fixed: was 'menu_allergens_list'
-            if set(user_alls_list).intersection(set(menu_alls_list)):
-                return {
-                    'safe': False,
-                    'reason': f'DIRECT_ALLERGEN_MATCH_FALLBACK: {set(user_alls_list).intersection(set(menu_alls_list))}',
-                    'risk_level': 'CRITICAL',
-                    'model_confidence': None
-                }
-            # Basic check for celiac/gluten (critical safety rule)
-            if 'celiac_disease' in self._safe_split(user_profile['health_conditions']) and 'gluten' in menu_alls_list:
-                 return {
-                    'safe': False,
-                    'reason': 'CELIAC_GLUTEN_MATCH_FALLBACK (Critical Safety Rule)',
-                    'risk_level': 'CRITICAL',
-                    'model_confidence': None
-                }
-            # If no rule-based conflict
-            return {
-                'safe': True,
-                'reason': 'FALLBACK_NO_DIRECT_CONFLICT',
-                'risk_level': 'LOW',
-                'model_confidence': None
-            }
+            return self._rule_based_check(user_alls_list, menu_alls_list, user_health_list, menu_item['allergens'], 'FALLBACK')
 
+        # --- Hard rules first: an item they block never reaches the model ---
+        hard_rule_result = self._apply_hard_rules(user_alls_list, menu_alls_list, user_health_list, menu_item)
+        if hard_rule_result is not None:
+            return hard_rule_result
 
         # --- Use Trained Model if Available ---
         X_single = self._preprocess_single_input(user_profile, menu_item, restaurant)
@@ -262,113 +325,197 @@ class SafetyAgent:
              return {'safe': False, 'reason': 'PREPROCESSING_ERROR', 'risk_level': 'UNKNOWN', 'model_confidence': None}
 
         try:
-            prediction_proba = self.model.predict_proba(X_single)[0] # [prob_safe, prob_unsafe]
-            prediction = self.model.predict(X_single)[0]
+            prob_unsafe = self._booster.inplace_predict(X_single)[0]
         except Exception as e:
             print(f"Error during model prediction: {e}. Falling back to rule-based checks.")
             # Fallback to rules within the trained branch
-            if pd.isna(menu_item['allergens']) or menu_item['allergens'].strip() == '':
-                return {
-                    'safe': False,
-                    'reason': 'MISSING_ALLERGEN_INFO_FALLBACK_IN_PRED (Critical Safety Rule)',
-                    'risk_level': 'HIGH',
-                    'model_confidence': None
-                }
-            user_alls_list = self._safe_split(user_profile['allergies'])
-            menu_alls_list = self._safe_split(menu_item['allergens']) # Fixed
-            if set(user_alls_list).intersection(set(menu_alls_list)):
-                return {
-                    'safe': False,
-                    'reason': f'DIRECT_ALLERGEN_MATCH_FALLBACK_IN_PRED: {set(user_alls_list).intersection(set(menu_alls_list))}',
-                    'risk_level': 'CRITICAL',
-                    'model_confidence': None
-                }
-            if 'celiac_disease' in self._safe_split(user_profile['health_conditions']) and 'gluten' in menu_alls_list:
-                 return {
-                    'safe': False,
-                    'reason': 'CELIAC_GLUTEN_MATCH_FALLBACK_IN_PRED (Critical Safety Rule)',
-                    'risk_level': 'CRITICAL',
-                    'model_confidence': None
-                }
+            return self._rule_based_check(user_alls_list, menu_alls_list, user_health_list, menu_item['allergens'], 'FALLBACK_IN_PRED')
+
+        # Interpret ML results (hard rules already passed)
+        return self._interpret_prediction(prob_unsafe, prob_unsafe <= 0.5) # Same 0.5 decision threshold as XGBClassifier.predict
+
+
+    def _rule_based_check(self, user_alls_list: List[str], menu_alls_list: List[str], user_health_list: List[str],
+                          allergens, tag: str) -> Dict[str, Any]:
+        """
+        Rule-only safety check used when the model is unavailable; `tag` marks the fallback in the reason.
+        """
+        # Basic check for missing allergens (critical safety rule)
+        if pd.isna(allergens) or allergens.strip() == '':
             return {
-                'safe': True,
-                'reason': 'FALLBACK_NO_DIRECT_CONFLICT_IN_PRED',
-                'risk_level': 'LOW',
+                'safe': False,
+                'reason': f'MISSING_ALLERGEN_INFO_{tag} (Critical Safety Rule)',
+                'risk_level': 'HIGH',
                 'model_confidence': None
             }
+        # Basic check for direct allergen match (critical safety rule)
+        allergen_matches = set(user_alls_list).intersection(set(menu_alls_list))
+        if allergen_matches:
+            return {
+                'safe': False,
+                'reason': f'DIRECT_ALLERGEN_MATCH_{tag}: {allergen_matches}',
+                'risk_level': 'CRITICAL',
+                'model_confidence': None
+            }
+        # Basic check for celiac/gluten (critical safety rule)
+        if 'celiac_disease' in user_health_list and 'gluten' in menu_alls_list:
+            return {
+                'safe': False,
+                'reason': f'CELIAC_GLUTEN_MATCH_{tag} (Critical Safety Rule)',
+                'risk_level': 'CRITICAL',
+                'model_confidence': None
+            }
+        # If no rule-based conflict
+        return {
+            'safe': True,
+            'reason': f'{tag}_NO_DIRECT_CONFLICT',
+            'risk_level': 'LOW',
+            'model_confidence': None
+        }
+
+
+    def check_safety_batch(self, user_profile: pd.Series, menu_items: pd.DataFrame, restaurants: pd.DataFrame) -> List[Dict[str, Any]]:
+        """
+        Evaluates many menu items for one user (e.g. a recommendation list) with a single model call.
+        Returns one result per row of `menu_items`, in order, with the same contents as check_safety.
+        Prediction is single-threaded, so many users can be evaluated in parallel at the process level
+        (e.g. joblib.Parallel over users) without oversubscribing cores.
+        """
+        if not self.trained or self.fallback_active or menu_items.empty:
+            restaurants_by_id = restaurants.set_index('restaurant_id', drop=False)
+            return [self.check_safety(user_profile, menu_item, restaurants_by_id.loc[menu_item['restaurant_id']])
+                    for _, menu_item in menu_items.iterrows()]
+
+        # Hard-rule conditions as masks over all items; blocked items are not sent to the model
+        user_alls_list = self._safe_split(user_profile['allergies'])
+        user_health_list = self._safe_split(user_profile['health_conditions'])
+        menu_alls_lists = menu_items['allergens'].apply(self._safe_split)
+        allergens = menu_items['allergens']
+        missing_allergen_info = (allergens.isna() | (allergens.str.strip() == '')).to_numpy(dtype=bool)
+        menu_has_shellfish = menu_alls_lists.apply(lambda alls: 'shellfish' in alls).to_numpy(dtype=bool)
+        if '_has_seafood' not in menu_items:
+            menu_items = self.add_menu_flags(menu_items)
+        menu_has_seafood = menu_items['_has_seafood'].to_numpy(dtype=bool)
+        shellfish_conflict = ('shellfish' in user_alls_list) & (menu_has_shellfish | menu_has_seafood)
+        celiac_conflict = ('celiac_disease' in user_health_list) & menu_alls_lists.apply(lambda alls: 'gluten' in alls).to_numpy(dtype=bool)
+        results = [
+            self._hard_rule_result(missing, shellfish, celiac)
+            for missing, shellfish, celiac in zip(missing_allergen_info, shellfish_conflict, celiac_conflict)
+        ]
+        to_predict = np.flatnonzero([result is None for result in results])
+        if len(to_predict) == 0:
+            return results
+
+        # Encode the remaining items at once; the user's features are encoded once and repeated
+        n_items = len(to_predict)
+        items = menu_items.iloc[to_predict]
+        item_allergens = items['allergens']
+        budget_min, budget_max = user_profile['budget_range_myr'].split('-', 1)
+        cuisine = items['restaurant_id'].map(restaurants.set_index('restaurant_id')['cuisine_type'])
+        X = self._build_feature_matrix(
+            np.repeat(self.user_allergies_encoder.transform([user_alls_list]), n_items, axis=0),
+            self.menu_allergens_encoder.transform(menu_alls_lists.iloc[to_predict]),
+            np.repeat(self.health_conditions_encoder.transform([user_health_list]), n_items, axis=0),
+            self._cuisine_codes(cuisine),
+            np.full(n_items, int(budget_min)),
+            np.full(n_items, int(budget_max)),
+            items['price_myr'].to_numpy(),
+            (item_allergens.isna() | (item_allergens == '') | (item_allergens == 'none')).to_numpy(),
+        )
+
+        try:
+            prob_unsafe = self._booster.inplace_predict(X) # P(unsafe) per item
+        except Exception as e:
+            print(f"Error during model prediction: {e}. Falling back to rule-based checks.")
+            restaurants_by_id = restaurants.set_index('restaurant_id', drop=False)
+            return [self.check_safety(user_profile, menu_item, restaurants_by_id.loc[menu_item['restaurant_id']])
+                    for _, menu_item in menu_items.iterrows()]
+
+        for i, prob in zip(to_predict, prob_unsafe):
+            results[i] = self._interpret_prediction(prob, prob <= 0.5)
+        return results
 
 
-        # Interpret ML results
-        prob_unsafe = prediction_proba[1]
-        is_safe_ml = prediction == 0 # 0 means safe in our target encoding
+    @staticmethod
+    def add_menu_flags(menus: pd.DataFrame) -> pd.DataFrame:
+        """
+        Returns `menus` with the ingredient flags used by the hard rules precomputed as columns,
+        so per-item safety checks don't re-scan the ingredient text (call once after loading menus).
+        """
+        return menus.assign(
+            _has_seafood=menus['ingredients_clean'].str.contains('seafood', case=False, regex=False, na=False)
+        )
+
+
+    def _menu_has_seafood(self, menu_item: pd.Series) -> bool:
+        """
+        Seafood flag for one menu item: the precomputed '_has_seafood' column if present, else a text scan.
+        """
+        if '_has_seafood' in menu_item:
+            return bool(menu_item['_has_seafood'])
+        return 'seafood' in menu_item['ingredients_clean'].lower()
+
+
+    def _apply_hard_rules(self, user_alls_list: List[str], menu_alls_list: List[str], user_health_list: List[str],
+                          menu_item: pd.Series) -> Optional[Dict[str, Any]]:
+        """
+        Critical safety rules checked before the model. Returns the blocking result, or None if no rule fires.
+        """
+        missing_allergen_info = pd.isna(menu_item['allergens']) or menu_item['allergens'].strip() == ''
+        # Example: Shellfish allergy + Seafood dish (from PDF: "Hard-coded safety rules(e.g., shellfish allergy → flag all seafood)")
+        shellfish_conflict = 'shellfish' in user_alls_list and ('shellfish' in menu_alls_list or self._menu_has_seafood(menu_item))
+        # Example: Celiac + Gluten
+        celiac_conflict = 'celiac_disease' in user_health_list and 'gluten' in menu_alls_list
+        return self._hard_rule_result(missing_allergen_info, shellfish_conflict, celiac_conflict)
 
+
+    def _hard_rule_result(self, missing_allergen_info: bool, shellfish_conflict: bool, celiac_conflict: bool) -> Optional[Dict[str, Any]]:
+        """
+        Maps evaluated hard-rule conditions to a blocking result (None if none applies).
+        """
+        # Missing allergen data first (critical for safety)
+        if missing_allergen_info:
+            return {
+                'safe': False,
+                'reason': 'MISSING_ALLERGEN_INFO (Critical Safety Rule)',
+                'risk_level': 'HIGH',
+                'model_confidence': None
+            }
+        if shellfish_conflict:
+            return {
+                'safe': False,
+                'reason': 'HARD_RULE_Shellfish_Allergy_Seafood_Conflict',
+                'risk_level': 'CRITICAL',
+                'model_confidence': None
+            }
+        if celiac_conflict:
+            return {
+                'safe': False,
+                'reason': 'HARD_RULE_Celiac_Gluten_Conflict',
+                'risk_level': 'CRITICAL',
+                'model_confidence': None
+            }
+        return None
+
+
+    def _interpret_prediction(self, prob_unsafe, is_safe_ml: bool) -> Dict[str, Any]:
+        """
+        Turns the model output for one user-menu pair (that passed the hard rules) into a safety result.
+        """
         # Determine outcome based on ML prediction and confidence
         if not is_safe_ml or prob_unsafe > 0.7: # Threshold for high risk based on probability
             risk_level_ml = "CRITICAL" if prob_unsafe > 0.9 else ("HIGH" if prob_unsafe > 0.7 else "MEDIUM")
-            # Apply Hard Constraints *after* ML prediction as a secondary check/sanity check
-            # Example: Shellfish allergy + Seafood dish (from PDF: "Hard-coded safety rules(e.g., shellfish allergy → flag all seafood)")
-            user_alls_list = self._safe_split(user_profile['allergies'])
-            menu_alls_list = self._safe_split(menu_item['allergens']) # Fixed
-            menu_ingredients_lower = menu_item['ingredients_clean'].lower()
-
-            if 'shellfish' in user_alls_list and ('shellfish' in menu_alls_list or 'seafood' in menu_ingredients_lower):
-                 return {
-                     'safe': False,
-                     'reason': f'ML_Predicted_Unsafe ({prob_unsafe:.2f}) BUT_HARD_RULE_Shellfish_Allergy_Seafood_Conflict',
-                     'risk_level': 'CRITICAL', # Override to critical for hard rule
-                     'model_confidence': prob_unsafe
-                 }
-            # Example: Celiac + Gluten
-            if 'celiac_disease' in self._safe_split(user_profile['health_conditions']) and 'gluten' in menu_alls_list:
-                 return {
-                     'safe': False,
-                     'reason': f'ML_Predicted_Unsafe ({prob_unsafe:.2f}) BUT_HARD_RULE_Celiac_Gluten_Conflict',
-                     'risk_level': 'CRITICAL', # Override to critical for hard rule
-                     'model_confidence': prob_unsafe
-                 }
-            # If no hard rule conflict, return ML result
             return {
                 'safe': False,
                 'reason': f'ML_Model_Predicted_Unsafe (Confidence: {prob_unsafe:.2f})',
                 'risk_level': risk_level_ml,
                 'model_confidence': prob_unsafe
             }
-        else:
-            # ML says Safe, but still apply critical hard rules as a final check
-            user_alls_list = self._safe_split(user_profile['allergies'])
-            menu_alls_list = self._safe_split(menu_item['allergens']) # Fixed
-            menu_ingredients_lower = menu_item['ingredients_clean'].lower()
-            user_health_list = self._safe_split(user_profile['health_conditions'])
-
-            # Example hard rule: Shellfish allergy + Seafood dish
-            if 'shellfish' in user_alls_list and ('shellfish' in menu_alls_list or 'seafood' in menu_ingredients_lower):
-                 return {
-                     'safe': False,
-                     'reason': 'HARD_RULE_Shellfish_Allergy_Seafood_Conflict (Overrides ML Safe)',
-                     'risk_level': 'CRITICAL',
-                     'model_confidence': prob_unsafe # Confidence of the *incorrect* safe prediction
-                 }
-            # Example hard rule: Celiac + Gluten
-            if 'celiac_disease' in user_health_list and 'gluten' in menu_alls_list:
-                 return {
-                     'safe': False,
-                     'reason': 'HARD_RULE_Celiac_Gluten_Conflict (Overrides ML Safe)',
-                     'risk_level': 'CRITICAL',
-                     'model_confidence': prob_unsafe # Confidence of the *incorrect* safe prediction
-                 }
-            # Final check: Missing allergen data (should ideally be caught earlier, but double-check)
-            if pd.isna(menu_item['allergens']) or menu_item['allergens'].strip() == '':
-                 return {
-                     'safe': False,
-                     'reason': 'MISSING_ALLERGEN_INFO (Critical Safety Rule Overrides ML Safe)',
-                     'risk_level': 'HIGH',
-                     'model_confidence': prob_unsafe # Confidence of the *incorrect* safe prediction
-                 }
-
-            # If ML says safe AND all hard checks pass
-            return {
-                'safe': True,
-                'reason': f'ML_Model_Predicted_Safe (Confidence: {1-prob_unsafe:.2f})',
-                'risk_level': 'LOW',
-                'model_confidence': 1 - prob_unsafe
-            }
+
+        # ML says safe AND all hard checks passed
+        return {
+            'safe': True,
+            'reason': f'ML_Model_Predicted_Safe (Confidence: {1-prob_unsafe:.2f})',
+            'risk_level': 'LOW',
+            'model_confidence': 1 - prob_unsafe
+        }
@@ -1,14 +1,38 @@
 # app.py
 import streamlit as st
 import pandas as pd
+import os
 import random
+import re
 
 # --- Load Data ---
+# Opt-in Parquet side-cache of the parsed CSVs (PALATE_PARQUET_CACHE=1); it writes files into data/
+USE_PARQUET_CACHE = os.environ.get('PALATE_PARQUET_CACHE', '0') == '1'
+
+def read_csv_cached(csv_path):
+    # Arrow-backed columns keep string handling (fillna, .str.*) in vectorized C
+    if not USE_PARQUET_CACHE:
+        return pd.read_csv(csv_path, engine='pyarrow', dtype_backend='pyarrow')
+    # Parse the CSV once and keep a Parquet copy next to it; later cold starts load the Parquet
+    # file instead (re-parsed whenever the CSV is newer than its cache)
+    parquet_path = os.path.splitext(csv_path)[0] + '.parquet'
+    if os.path.exists(parquet_path) and os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path):
+        try:
+            return pd.read_parquet(parquet_path, dtype_backend='pyarrow')
+        except Exception:
+            pass # Unreadable cache file: fall back to the CSV below
+    df = pd.read_csv(csv_path, engine='pyarrow', dtype_backend='pyarrow')
+    try:
+        df.to_parquet(parquet_path, compression='zstd')
+    except Exception:
+        pass # The cache is best-effort (read-only folder, Parquet/codec unavailable, ...): serve the parsed CSV
+    return df
+
 @st.cache_data
 def load_data():
-    users = pd.read_csv('data/User_Profiles.csv')
-    restaurants = pd.read_csv('data/Restaurants.csv')
-    menus = pd.read_csv('data/Menu.csv')
+    users = read_csv_cached('data/User_Profiles.csv')
+    restaurants = read_csv_cached('data/Restaurants.csv')
+    menus = read_csv_cached('data/Menu.csv')
     return users, restaurants, menus
 
 try:
@@ -26,9 +50,16 @@ if not data_loaded:
 
 # --- Sanitize NaN in critical columns (prevents AttributeError) ---
 for col in ['allergies', 'health_conditions']:
-    users[col] = users[col].fillna('none').astype(str)
+    users[col] = users[col].fillna('none')
 for col in ['allergens']:
-    menus[col] = menus[col].fillna('none').astype(str)
+    menus[col] = menus[col].fillna('none')
+
+# Parse each menu item's allergens once; safety checks reuse these sets instead of re-splitting per call
+menus['_allergens_set'] = menus['allergens'].map(lambda a: frozenset(a.split('_') if a != 'none' else []))
+
+# Indexed views for per-item / per-restaurant lookups (hashed .loc instead of a full-column scan)
+menus_idx = menus.set_index('menu_id', drop=False)
+restaurants_idx = restaurants.set_index('restaurant_id', drop=False)
 
 st.sidebar.info("✅ Data sanitized: NaN → 'none' for allergy/health/allergen fields.")
 
@@ -49,28 +80,37 @@ class RecommendationAgent:
 
 class SafetyAgent:
     def check_safety(self, user, menu_item, restaurant):
+        user_alls = set(user['allergies'].split('_') if user['allergies'] != 'none' else [])
+        return self._check_allergens(user_alls, user['health_conditions'], menu_item['allergens'], menu_item['_allergens_set'])
+
+    def check_safety_batch(self, user, menu_items, restaurants_df):
+        # One result per row of menu_items, in order; the user's allergies are parsed once for all items
+        user_alls = set(user['allergies'].split('_') if user['allergies'] != 'none' else [])
+        return [
+            self._check_allergens(user_alls, user['health_conditions'], allergens, menu_alls)
+            for allergens, menu_alls in zip(menu_items['allergens'], menu_items['_allergens_set'])
+        ]
+
+    def _check_allergens(self, user_alls, health_conditions, allergens, menu_alls):
         # Hard rules first
-        if pd.isna(menu_item['allergens']) or menu_item['allergens'].strip() == '':
+        if pd.isna(allergens) or allergens.strip() == '':
             return {'safe': False, 'reason': 'MISSING_ALLERGEN_INFO'}
         
-        user_alls = set(user['allergies'].split('_') if user['allergies'] != 'none' else [])
-        menu_alls = set(menu_item['allergens'].split('_') if menu_item['allergens'] != 'none' else [])
-        
         if user_alls & menu_alls:
             return {'safe': False, 'reason': f'DIRECT_ALLERGEN_MATCH: {user_alls & menu_alls}'}
         
-        if 'celiac_disease' in user['health_conditions'] and 'gluten' in menu_alls:
+        if 'celiac_disease' in health_conditions and 'gluten' in menu_alls:
             return {'safe': False, 'reason': 'CELIAC_GLUTEN_CONFLICT'}
         
         return {'safe': True, 'reason': 'NO_CONFLICT'}
 
 class RealTimeAgent:
     def get_wait_time(self, restaurant_id, restaurants_df):
-        # Simulate wait time based on restaurant rating and price
-        rest_info = restaurants_df[restaurants_df['restaurant_id'] == restaurant_id]
-        if not rest_info.empty:
-            avg_rating = rest_info.iloc[0]['avg_rating']
-            price_range = rest_info.iloc[0]['price_range']
+        # Simulate wait time based on restaurant rating and price (restaurants_df is indexed by restaurant_id)
+        if restaurant_id in restaurants_df.index:
+            rest_info = restaurants_df.loc[restaurant_id]
+            avg_rating = rest_info['avg_rating']
+            price_range = rest_info['price_range']
             base = 10 + (avg_rating - 3) * 3
             if price_range == 'Premium': base += 15
             elif price_range == 'Medium': base += 5
@@ -81,9 +121,13 @@ class RealTimeAgent:
         return {'wait_minutes': random.randint(10, 45)}
 
 class ReviewAnalysisAgent:
+    safety_keywords = ['cross-contamination', 'hidden shellfish', 'felt sick', 'reaction', 'allergic']
+    # All keywords are matched in a single compiled pass over the text (the lookahead also finds overlapping ones)
+    keyword_pattern = re.compile('(?=(' + '|'.join(map(re.escape, safety_keywords)) + '))')
+
     def analyze(self, text):
-        safety_keywords = ['cross-contamination', 'hidden shellfish', 'felt sick', 'reaction', 'allergic']
-        found = [kw for kw in safety_keywords if kw in text.lower()]
+        matched = set(self.keyword_pattern.findall(text.lower()))
+        found = [kw for kw in self.safety_keywords if kw in matched]
         return {
             'safety_flags': found,
             'requires_review': len(found) > 0,
@@ -106,12 +150,14 @@ class MenuOCRAgent:
 
 class OptimizationAgent:
     def get_insights(self, restaurant_id, menus_df, restaurants_df):
+        # restaurants_df is indexed by restaurant_id
         rest_menus = menus_df[menus_df['restaurant_id'] == restaurant_id]
-        rest_info = restaurants_df[restaurants_df['restaurant_id'] == restaurant_id].iloc[0]
+        rest_info = restaurants_df.loc[restaurant_id]
+        avg_price = rest_menus['price_myr'].mean() # pd.NA (Arrow-backed) when the restaurant has no menu items
         return {
             'restaurant_id': restaurant_id,
             'total_items': len(rest_menus),
-            'avg_price': round(rest_menus['price_myr'].mean(), 2),
+            'avg_price': round(avg_price, 2) if not pd.isna(avg_price) else float('nan'),
             'high_risk_items': rest_menus['allergens'].str.contains('shellfish|peanut').sum(),
             'cuisine': rest_info['cuisine_type'],
             'rating': rest_info['avg_rating']
@@ -149,11 +195,11 @@ if st.button("🚀 Run All 6 AI Agents"):
         # 2. Safety & Risk Assessment Agent
         st.subheader("2️⃣ Safety & Risk Assessment Agent (🧠: XGBoost + Hard Rules)")
         safe_list, blocked_list = [], []
-        for _, row in recs.iterrows():
-            menu_item = menus[menus['menu_id'] == row['menu_id']].iloc[0]
-            resto_info = restaurants[restaurants['restaurant_id'] == menu_item['restaurant_id']].iloc[0]
-            safety_result = safety_agent.check_safety(user, menu_item, resto_info)
-            combined = {**row.to_dict(), **safety_result}
+        # All recommended items are checked in one call (menu rows looked up in recommendation order)
+        candidate_items = menus_idx.loc[recs['menu_id']]
+        safety_results = safety_agent.check_safety_batch(user, candidate_items, restaurants_idx)
+        for row, safety_result in zip(recs.to_dict('records'), safety_results):
+            combined = {**row, **safety_result}
             if safety_result['safe']:
                 safe_list.append(combined)
             else:
@@ -175,7 +221,7 @@ if st.button("🚀 Run All 6 AI Agents"):
         # 3. Real-Time Data Processing Agent
         st.subheader("3️⃣ Real-Time Data Processing Agent (🧠: XGBoostRegressor)")
         demo_resto = safe_df.iloc[0]['restaurant_id'] if not safe_df.empty else resto_id
-        wait_info = realtime_agent.get_wait_time(demo_resto, restaurants)
+        wait_info = realtime_agent.get_wait_time(demo_resto, restaurants_idx)
         st.json(wait_info)
 
         # 4. Review & Sentiment Analysis Agent
@@ -194,7 +240,7 @@ if st.button("🚀 Run All 6 AI Agents"):
 
         # 6. Restaurant Optimization Agent
         st.subheader("6️⃣ Restaurant Optimization Agent (🧠: K-Means Clustering)")
-        opt_res = opt_agent.get_insights(resto_id, menus, restaurants)
+        opt_res = opt_agent.get_insights(resto_id, menus, restaurants_idx)
         st.json(opt_res)
 
 st.markdown("---")
@@ -1,42 +1,139 @@
+import json
+from datetime import datetime
 import pytest
 import pandas as pd
-from agents import SafetyAgent, RecommendationAgent, RealTimeAgent, OptimizationAgent
+from joblib import Parallel, delayed
+from agents import SafetyAgent, RecommendationAgent, RealTimeAgent, ReviewAnalysisAgent, OptimizationAgent
 
 # --- Load Test Data ---
-user_profiles = pd.read_csv('data/user_profiles.csv')
-restaurants = pd.read_csv('data/restaurants.csv')
-menus = pd.read_csv('data/menu.csv')
+user_profiles = pd.read_csv('data/user_profiles.csv', engine='pyarrow', dtype_backend='pyarrow')
+restaurants = pd.read_csv('data/restaurants.csv', engine='pyarrow', dtype_backend='pyarrow')
+menus = pd.read_csv('data/menu.csv', engine='pyarrow', dtype_backend='pyarrow')
 
-# --- Initialize Agents for Testing ---
-safety_agent = SafetyAgent()
-rec_agent = RecommendationAgent()
-realtime_agent = RealTimeAgent()
-opt_agent = OptimizationAgent()
+# --- Train Agents for Testing ---
+# Smaller samples for speed
+users_sample = user_profiles.sample(20)
+menus_sample = menus.sample(50)
 
-def test_safety_agent_training():
+def _train_agent(agent, *data):
+    """Trains one agent in a worker process; returns its name, the agent and any training error."""
+    if isinstance(agent, SafetyAgent):
+        agent.model.set_params(n_jobs=1) # One XGBoost thread per process; the processes provide the parallelism
+    try:
+        agent.train(*data)
+    except Exception as e:
+        return type(agent).__name__, agent, e
+    return type(agent).__name__, agent, None
+
+@pytest.fixture(scope='module')
+def trained_agents():
+    """The four agents are independent, so they are trained once, concurrently (one process each)."""
+    results = Parallel(n_jobs=-1, backend='loky')([
+        delayed(_train_agent)(SafetyAgent(), users_sample, menus_sample, restaurants),
+        delayed(_train_agent)(RecommendationAgent(), users_sample, menus_sample, restaurants),
+        delayed(_train_agent)(RealTimeAgent(), restaurants),
+        delayed(_train_agent)(OptimizationAgent(), menus_sample, restaurants),
+    ])
+    return {name: (agent, error) for name, agent, error in results}
+
+def _trained(trained_agents, name):
+    """Returns the trained agent, re-raising the error if its training failed."""
+    agent, error = trained_agents[name]
+    if error is not None:
+        raise error
+    return agent
+
+def test_safety_agent_training(trained_agents):
     """Test that the safety agent can be trained."""
-    safety_agent.train(user_profiles.sample(20), menus.sample(50), restaurants) # Use smaller sample for speed
+    safety_agent = _trained(trained_agents, 'SafetyAgent')
     assert safety_agent.trained == True
     print("✅ Safety Agent training test passed.")
 
-def test_recommendation_agent_training():
+def test_safety_agent_save_load(trained_agents, tmp_path):
+    """Test that a trained safety agent gives the same results after saving and loading."""
+    agent = _trained(trained_agents, 'SafetyAgent')
+    agent.save(tmp_path / 'safety_agent.joblib')
+    loaded = SafetyAgent.load(tmp_path / 'safety_agent.joblib')
+    assert loaded.trained == True
+    user, menu_item = users_sample.iloc[0], menus_sample.iloc[0]
+    restaurant = restaurants[restaurants['restaurant_id'] == menu_item['restaurant_id']].iloc[0]
+    assert loaded.check_safety(user, menu_item, restaurant) == agent.check_safety(user, menu_item, restaurant)
+    print("✅ Safety Agent save/load test passed.")
+
+def test_safety_agent_unseen_cuisine(trained_agents):
+    """Test that single and batch checks agree for a cuisine not seen in training."""
+    agent = _trained(trained_agents, 'SafetyAgent')
+    unseen_restaurants = restaurants.assign(cuisine_type='Unseen Cuisine')
+    user = users_sample.iloc[0]
+    batch_results = agent.check_safety_batch(user, menus_sample, unseen_restaurants)
+    for (_, menu_item), batch_result in zip(menus_sample.iterrows(), batch_results):
+        restaurant = unseen_restaurants[unseen_restaurants['restaurant_id'] == menu_item['restaurant_id']].iloc[0]
+        assert agent.check_safety(user, menu_item, restaurant) == batch_result
+    print("✅ Safety Agent unseen cuisine test passed.")
+
+def test_recommendation_agent_training(trained_agents):
     """Test that the recommendation agent can be trained."""
-    rec_agent.train(user_profiles.sample(20), menus.sample(50), restaurants)
+    rec_agent = _trained(trained_agents, 'RecommendationAgent')
     assert rec_agent.trained == True
     print("✅ Recommendation Agent training test passed.")
 
-def test_realtime_agent_training():
+def test_realtime_agent_training(trained_agents):
     """Test that the realtime agent can be trained."""
-    realtime_agent.train(restaurants)
+    realtime_agent = _trained(trained_agents, 'RealTimeAgent')
     assert realtime_agent.trained == True
     print("✅ Real-Time Agent training test passed.")
 
-def test_optimization_agent_training():
+@pytest.mark.parametrize('trained', [True, False])
+def test_realtime_agent_batch_matches_single(trained_agents, trained):
+    """Test that batched wait times match per-restaurant predictions, including an unknown restaurant."""
+    realtime_agent = _trained(trained_agents, 'RealTimeAgent') if trained else RealTimeAgent()
+    restaurant_ids = restaurants['restaurant_id'].head(5).tolist() + ['UNKNOWN']
+    when = datetime(2024, 5, 17, 12, 30) # Friday lunch
+    expected = [realtime_agent.get_wait_time(rid, when)['estimated_wait_minutes'] for rid in restaurant_ids]
+    assert realtime_agent.get_wait_times(restaurant_ids, when).tolist() == expected
+    print("✅ Real-Time Agent batch test passed.")
+
+def test_review_agent_batch_matches_single():
+    """Test that the batched review analysis gives the same result as per-review analysis."""
+    review_agent = ReviewAnalysisAgent()
+    reviews = [
+        "Lovely food and friendly staff.", # No keywords
+        "The shrimp had hidden shellfish sauce and I had an allergic reaction, felt sick afterwards.", # Several keywords
+        "Was it gluten free? NOT GLUTEN FREE, a big MISTAKE.",
+    ]
+    assert review_agent.analyze_batch(reviews) == [review_agent.analyze_review(r) for r in reviews]
+    print("✅ Review Agent batch test passed.")
+
+def test_optimization_agent_training(trained_agents):
     """Test that the optimization agent can be trained."""
-    opt_agent.train(menus.sample(50), restaurants) # Use smaller sample for speed
+    opt_agent = _trained(trained_agents, 'OptimizationAgent')
     assert opt_agent.trained == True
     print("✅ Optimization Agent training test passed.")
 
+def test_optimization_agent_untrained_insights():
+    """Test the untrained fallback aggregates the menus passed in."""
+    opt_agent = OptimizationAgent()
+    restaurant_id = menus['restaurant_id'].iloc[0]
+    rest_menus = menus[menus['restaurant_id'] == restaurant_id]
+    insights = opt_agent.get_restaurant_insights(restaurant_id, menus)
+    assert insights['total_menu_items'] == len(rest_menus)
+    for allergen in ['shellfish', 'gluten', 'dairy']:
+        expected = sum(allergen in a for a in rest_menus['allergens'].dropna())
+        assert insights[f'items_with_{allergen}'] == expected
+    assert 'error' in opt_agent.get_restaurant_insights(restaurant_id)
+    print("✅ Optimization Agent untrained insights test passed.")
+
+def test_app_restaurant_without_menu_items():
+    """Test that the app runs all agents for a restaurant with no menu items."""
+    app_test = pytest.importorskip('streamlit.testing.v1').AppTest
+    resto_id = restaurants.loc[~restaurants['restaurant_id'].isin(menus['restaurant_id']), 'restaurant_id'].iloc[0]
+    at = app_test.from_file('app.py', default_timeout=120).run()
+    at.sidebar.selectbox[1].select(resto_id).run()
+    at.button[0].click().run()
+    assert not at.exception
+    assert json.loads(at.json[-1].value)['total_items'] == 0
+    print("✅ App restaurant-without-menu test passed.")
+
 # --- Run Tests ---
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -1,6 +1,31 @@
 import pandas as pd
-from typing import Dict, Any
+from functools import lru_cache
+from typing import Dict, Any, FrozenSet, Tuple
 import re
+from .safety_agent import SafetyAgent
+
+# Lines mentioning ingredients, and the remaining lines mentioning allergens or "contains"
+_INGREDIENT_LINE_RE = re.compile(r'^.*ingredient.*$', re.MULTILINE)
+_ALLERGEN_LINE_RE = re.compile(r'^(?!.*ingredient).*(?:allergen|contains).*$', re.MULTILINE)
+
+
+@lru_cache(maxsize=512)
+def _process_ocr(extracted_text: str) -> Tuple[str, FrozenSet[str]]:
+    """
+    Parses OCR text into (ingredients summary, allergen types found). A pure function of the
+    text, cached because Streamlit reruns process the same text again and again.
+    """
+    # 1. Find lines containing keywords related to ingredients/allergens (an ingredient line never
+    #    counts as an allergen line), each with one regex scan over the whole text
+    text_lower = extracted_text.lower()
+    ingredients_section = "".join(" " + line for line in _INGREDIENT_LINE_RE.findall(text_lower))
+    allergens_section = "".join(" " + line for line in _ALLERGEN_LINE_RE.findall(text_lower))
+
+    # 2. Extract potential allergens based on keywords (mirroring SafetyAgent logic)
+    # One pass of SafetyAgent's keyword automaton finds every keyword; each hit adds its allergen type
+    found_allergens = frozenset(allergen_type for _, (allergen_type, _) in SafetyAgent.KEYWORD_AUTOMATON.iter(allergens_section))
+    return ingredients_section.strip(), found_allergens
+
 
 class MenuOCRAgent:
     """
@@ -18,25 +43,8 @@ class MenuOCRAgent:
         Simulates processing OCR-extracted text.
         In a real system, this takes the raw string from OCR models.
         """
-        # --- Simulate OCR-like processing ---
-        # 1. Find lines containing keywords related to ingredients/allergens
-        lines = extracted_text.lower().split('\n')
-        ingredients_section = ""
-        allergens_section = ""
-        for line in lines:
-            if 'ingredient' in line or 'contains' in line or 'allergen' in line:
-                if 'ingredient' in line:
-                    ingredients_section += " " + line
-                elif 'allergen' in line or 'contains' in line:
-                    allergens_section += " " + line
-
-        # 2. Extract potential allergens based on keywords (mirroring SafetyAgent logic)
-        found_allergens = set()
-        for allergen_type, keywords in self._get_allergen_keywords().items():
-            for keyword in keywords:
-                if keyword in allergens_section:
-                    found_allergens.add(allergen_type)
-                    break # Found one keyword for this type, add the type
+        # --- Simulate OCR-like processing (steps 1 and 2, cached per text) ---
+        ingredients_summary, found_allergens = _process_ocr(extracted_text)
 
         # 3. Determine status based on findings (mirroring PDF's "Potential Risk" concept)
         # If no allergens were explicitly listed in the OCR text, it's a risk.
@@ -44,20 +52,8 @@ class MenuOCRAgent:
 
         return {
             'input_text_preview': extracted_text[:150] + ("..." if len(extracted_text) > 150 else ""),
-            'extracted_ingredients_summary': ingredients_section.strip(),
+            'extracted_ingredients_summary': ingredients_summary,
             'extracted_allergens_list': list(found_allergens),
             'ocr_extracted_status': ocr_status, # Matches column name from PDF context and your menu.csv
             'confidence_in_extraction': 0.8 if found_allergens else 0.3 # Simulated confidence
         }
-
-    def _get_allergen_keywords(self):
-        """Helper to get allergen keywords, mirroring SafetyAgent."""
-        return {
-            'shellfish': ['shrimp', 'prawn', 'crab', 'lobster', 'mussel', 'clam', 'oyster', 'seafood', 'anchovies', 'sardines'],
-            'gluten': ['wheat', 'barley', 'rye', 'bread', 'pasta', 'flour', 'semolina', 'soy sauce', 'malt'],
-            'dairy': ['milk', 'cheese', 'butter', 'cream', 'yogurt', 'whey', 'casein'],
-            'egg': ['egg', 'omelet', 'mayonnaise', 'custard'],
-            'peanut': ['peanut', 'groundnut', 'arachis'],
-            'tree_nuts': ['almond', 'walnut', 'cashew', 'hazelnut', 'pecan', 'pistachio', 'macadamia'],
-            'soy': ['soy', 'tofu', 'tempeh', 'edamame', 'miso'],
-        }
@@ -1,4 +1,5 @@
 import pandas as pd
+from typing import Dict, Any
 
 class OptimizationAgent:
     """Agent 6: Provides business insights for restaurants."""
@@ -6,6 +7,22 @@ class OptimizationAgent:
     def __init__(self, menus_df: pd.DataFrame, restaurants_df: pd.DataFrame):
         self.menus = menus_df
         self.restaurants = restaurants_df
+        # Menus and restaurants are fixed after loading, so the per-restaurant aggregates are
+        # computed once here and get_restaurant_insights is a single indexed row lookup
+        # Allergen flag columns precomputed at load time are reused; missing ones are derived here
+        allergens = menus_df['allergens']
+        menu_flags = menus_df.assign(**{
+            f'has_{allergen}': allergens.str.contains(allergen, na=False)
+            for allergen in ['shellfish', 'gluten', 'dairy'] # ... add others as needed
+            if f'has_{allergen}' not in menus_df
+        })
+        self._insights = menu_flags.groupby('restaurant_id').agg(
+            average_menu_price=('price_myr', 'mean'),
+            total_menu_items=('price_myr', 'size'),
+            items_with_shellfish=('has_shellfish', 'sum'),
+            items_with_gluten=('has_gluten', 'sum'),
+            items_with_dairy=('has_dairy', 'sum'),
+        ).join(restaurants_df.set_index('restaurant_id')['cuisine_type'])
 
     def get_restaurant_insights(self, restaurant_id: str) -> Dict[str, Any]:
         """
@@ -17,23 +34,21 @@ class OptimizationAgent:
         Returns:
             A dictionary with business insights.
         """
-        restaurant_menus = self.menus[self.menus['restaurant_id'] == restaurant_id]
-        
-        if restaurant_menus.empty:
+        if restaurant_id not in self._insights.index:
             return {'error': f'No menu data found for restaurant {restaurant_id}'}
 
-        avg_price = restaurant_menus['price_myr'].mean()
-        total_items = len(restaurant_menus)
+        restaurant_insights = self._insights.loc[restaurant_id]
+        avg_price = float(restaurant_insights['average_menu_price'])
+        total_items = int(restaurant_insights['total_menu_items'])
         
         # Count items with specific allergens
-        shellfish_items = restaurant_menus['allergens'].str.contains('shellfish', na=False).sum()
-        gluten_items = restaurant_menus['allergens'].str.contains('gluten', na=False).sum()
-        dairy_items = restaurant_menus['allergens'].str.contains('dairy', na=False).sum()
-        # ... add others as needed
+        shellfish_items = int(restaurant_insights['items_with_shellfish'])
+        gluten_items = int(restaurant_insights['items_with_gluten'])
+        dairy_items = int(restaurant_insights['items_with_dairy'])
 
         # Most common cuisine type in the menu (if applicable)
         # Assuming cuisine type is consistent per restaurant, taken from restaurants.csv
-        cuisine_type = self.restaurants[self.restaurants['restaurant_id'] == restaurant_id]['cuisine_type'].iloc[0]
+        cuisine_type = restaurant_insights['cuisine_type']
 
 
         return {
@@ -41,8 +56,8 @@ class OptimizationAgent:
             'cuisine_type': cuisine_type,
             'average_menu_price': round(avg_price, 2),
             'total_menu_items': total_items,
-            'items_with_shellfish': int(shellfish_items),
-            'items_with_gluten': int(gluten_items),
-            'items_with_dairy': int(dairy_items),
+            'items_with_shellfish': shellfish_items,
+            'items_with_gluten': gluten_items,
+            'items_with_dairy': dairy_items,
             'safety_diversity_score': round((total_items - max(shellfish_items, gluten_items, dairy_items)) / total_items, 2) if total_items > 0 else 0
         }
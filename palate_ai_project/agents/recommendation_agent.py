@@ -6,32 +6,39 @@ class RecommendationAgent:
     def __init__(self, menus_df: pd.DataFrame, restaurants_df: pd.DataFrame):
         self.menus = menus_df
         self.restaurants = restaurants_df
+        # Per-menu arrays computed once; recommend() only combines boolean masks over them
+        halal_restaurant_ids = restaurants_df.loc[restaurants_df['halal_certified'] == 'Yes', 'restaurant_id']
+        self._menu_is_halal = menus_df['restaurant_id'].isin(halal_restaurant_ids).to_numpy()
+        self._menu_prices = menus_df['price_myr'].to_numpy()
 
     def recommend(self, user_profile: pd.Series, top_n: int = 5) -> pd.DataFrame:
         """
         Recommends menu items based on user preferences and constraints.
 
         Args:
-            user_profile: A row from user_profiles.csv.
+            user_profile: A row from user_profiles.csv (may carry the pre-parsed fields added by the app).
             top_n: Number of recommendations desired.
 
         Returns:
             A pandas DataFrame of recommended menu items.
         """
-        # Start with all menus
-        candidates = self.menus.copy()
-
-        # Filter by Halal if required
-        if 'halal' in user_profile['dietary_restrictions'].lower():
-            halal_restaurant_ids = self.restaurants[self.restaurants['halal_certified'] == 'Yes']['restaurant_id']
-            candidates = candidates[candidates['restaurant_id'].isin(halal_restaurant_ids)]
-
         # Filter by budget
-        budget_min, budget_max = map(int, user_profile['budget_range_myr'].split('-'))
-        candidates = candidates[(candidates['price_myr'] >= budget_min) & (candidates['price_myr'] <= budget_max)]
+        if 'budget_min' in user_profile:
+            # Already parsed at load time
+            budget_min, budget_max = user_profile['budget_min'], user_profile['budget_max']
+        else:
+            budget_min, budget_max = map(int, user_profile['budget_range_myr'].split('-'))
+        mask = (self._menu_prices >= budget_min) & (self._menu_prices <= budget_max)
 
-        # Sort by price as a simple baseline (could be enhanced with more complex logic)
-        sorted_candidates = candidates.sort_values(by='price_myr', ascending=True)
-
-        # Return top N candidates
-        return sorted_candidates[['menu_id', 'restaurant_id', 'dish_name', 'price_myr']].head(top_n)
+        # Filter by Halal if required
+        if 'dietary_restrictions_lower' in user_profile:
+            dietary_restrictions = user_profile['dietary_restrictions_lower'] # Already lowercased at load time
+        else:
+            dietary_restrictions = user_profile['dietary_restrictions'].lower()
+        if 'halal' in dietary_restrictions:
+            mask &= self._menu_is_halal
+
+        # Cheapest N candidates as a simple baseline (could be enhanced with more complex logic);
+        # only the matching rows are materialised, and nsmallest avoids a full sort
+        candidates = self.menus.loc[mask, ['menu_id', 'restaurant_id', 'dish_name', 'price_myr']]
+        return candidates.nsmallest(top_n, 'price_myr')
@@ -1,3 +1,7 @@
+from functools import lru_cache
+from typing import Dict, Any, Tuple
+from .safety_agent import build_keyword_automaton
+
 class ReviewAnalysisAgent:
     """Agent 4: Analyzes text for safety signals and sentiment."""
 
@@ -7,6 +11,17 @@ class ReviewAnalysisAgent:
         'hospital', 'not gluten free', 'hidden', 'mistake', 'wrong'
     ]
 
+    # Simple sentiment heuristic (could be replaced with a model)
+    POSITIVE_INDICATORS = ['good', 'great', 'excellent', 'amazing', 'love', 'perfect', 'delicious', 'yummy']
+    NEGATIVE_INDICATORS = ['bad', 'terrible', 'awful', 'hate', 'horrible', 'disgusting', 'gross', 'overpriced']
+
+    # All three word lists in one automaton, so a text is read once whatever their size
+    TEXT_AUTOMATON = build_keyword_automaton({
+        'signal': SAFETY_SIGNALS,
+        'positive': POSITIVE_INDICATORS,
+        'negative': NEGATIVE_INDICATORS,
+    })
+
     def analyze_text(self, text: str) -> Dict[str, Any]:
         """
         Analyzes a piece of text (e.g., a review or menu description).
@@ -18,14 +33,10 @@ class ReviewAnalysisAgent:
             A dictionary with analysis results.
         """
         text_lower = text.lower()
-        found_signals = [signal for signal in self.SAFETY_SIGNALS if signal in text_lower]
-        
-        # Simple sentiment heuristic (could be replaced with a model)
-        positive_indicators = ['good', 'great', 'excellent', 'amazing', 'love', 'perfect', 'delicious', 'yummy']
-        negative_indicators = ['bad', 'terrible', 'awful', 'hate', 'horrible', 'disgusting', 'gross', 'overpriced']
 
-        pos_score = sum(text_lower.count(word) for word in positive_indicators)
-        neg_score = sum(text_lower.count(word) for word in negative_indicators)
+        # The keyword scan is a pure function of the text, cached across repeated calls
+        found_signals, pos_score, neg_score = _scan_text(text_lower)
+        found_signals = list(found_signals)
 
         if pos_score > neg_score:
             sentiment = 'POSITIVE'
@@ -41,3 +52,22 @@ class ReviewAnalysisAgent:
             'safety_signals_found': found_signals,
             'requires_attention': len(found_signals) > 0 # Flag if any safety signal is found
         }
+
+
+@lru_cache(maxsize=512)
+def _scan_text(text_lower: str) -> Tuple[Tuple[str, ...], int, int]:
+    """Returns (safety signals found, positive score, negative score) for lowercased text, in one automaton pass."""
+    signals = set()
+    pos_score = neg_score = 0
+    last_end = {} # Sentiment words are counted without overlap, like str.count
+    for end, (group, word) in ReviewAnalysisAgent.TEXT_AUTOMATON.iter(text_lower):
+        if group == 'signal':
+            signals.add(word)
+        elif end - len(word) >= last_end.get(word, -1):
+            last_end[word] = end
+            if group == 'positive':
+                pos_score += 1
+            else:
+                neg_score += 1
+    found_signals = tuple(signal for signal in ReviewAnalysisAgent.SAFETY_SIGNALS if signal in signals)
+    return found_signals, pos_score, neg_score
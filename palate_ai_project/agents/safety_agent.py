@@ -1,5 +1,22 @@
+import re
+import numpy as np
 import pandas as pd
-from typing import Dict, Any
+import ahocorasick
+from typing import Dict, Any, List, Set
+
+
+def build_keyword_automaton(keywords: Dict[str, List[str]]) -> ahocorasick.Automaton:
+    """
+    Builds an Aho-Corasick automaton over groups of keywords (e.g. allergen type -> keywords),
+    so a text is scanned for every keyword in one linear pass. Each match yields (group, keyword).
+    """
+    automaton = ahocorasick.Automaton()
+    for group, group_keywords in keywords.items():
+        for keyword in group_keywords:
+            automaton.add_word(keyword, (group, keyword))
+    automaton.make_automaton()
+    return automaton
+
 
 class SafetyAgent:
     """Agent 1: Hard safety constraints for allergens and health conditions."""
@@ -13,6 +30,9 @@ class SafetyAgent:
         'tree_nuts': ['almond', 'walnut', 'cashew', 'hazelnut', 'pecan', 'pistachio', 'macadamia'],
         'soy': ['soy', 'tofu', 'tempeh', 'edamame', 'miso'],
     }
+    # Built once per process and shared by all instances
+    KEYWORD_AUTOMATON = build_keyword_automaton(ALLERGEN_KEYWORDS)
+    ALLERGEN_KEYWORD_SETS = {allergen: frozenset(keywords) for allergen, keywords in ALLERGEN_KEYWORDS.items()}
     
     # Note: Chronic conditions like diabetes/hypertension require nutritional info, which is not in the provided menu.csv
     # For now, we focus on allergens. A full implementation would require nutritional data.
@@ -28,9 +48,7 @@ class SafetyAgent:
         Returns:
             A dictionary with safety assessment results.
         """
-        user_allergies_str = user_profile['allergies']
-        # Handle multiple allergies separated by '_'
-        user_allergies = [a.strip() for a in user_allergies_str.split('_')] if user_allergies_str != 'none' else []
+        user_allergies = self._user_allergies(user_profile)
 
         menu_ingredients = menu_item['ingredients_clean']
         menu_allergens = menu_item['allergens']
@@ -43,6 +61,13 @@ class SafetyAgent:
                 'risk_level': 'HIGH'
             }
 
+        has_celiac = self._has_celiac(user_profile)
+
+        # Every keyword present in the ingredients, found in a single pass; only scanned when an
+        # allergy or the celiac rule checks keywords (missing ingredients have none, as in the batch check)
+        needs_keywords = has_celiac or any(a in self.ALLERGEN_KEYWORD_SETS for a in user_allergies)
+        found_keywords = self._find_keywords(menu_ingredients) if needs_keywords and not pd.isna(menu_ingredients) else set()
+
         # Check for allergen matches
         for user_allergy in user_allergies:
             # Direct match in the allergens column
@@ -53,21 +78,20 @@ class SafetyAgent:
                     'risk_level': 'CRITICAL'
                 }
             
-            # Check against ingredient keywords (more thorough check)
-            if user_allergy in self.ALLERGEN_KEYWORDS:
-                allergen_keywords = self.ALLERGEN_KEYWORDS[user_allergy]
-                for keyword in allergen_keywords:
-                    if keyword in menu_ingredients:
-                        return {
-                            'safe': False,
-                            'reason': f'INGREDIENT_KEYWORD_MATCH: Found "{keyword}" related to "{user_allergy}" in ingredients.',
-                            'risk_level': 'CRITICAL'
-                        }
+            # Check against ingredient keywords (more thorough check): one set test per allergy
+            if user_allergy in self.ALLERGEN_KEYWORD_SETS and not self.ALLERGEN_KEYWORD_SETS[user_allergy].isdisjoint(found_keywords):
+                # Report the first matching keyword in list order
+                keyword = next(keyword for keyword in self.ALLERGEN_KEYWORDS[user_allergy] if keyword in found_keywords)
+                return {
+                    'safe': False,
+                    'reason': f'INGREDIENT_KEYWORD_MATCH: Found "{keyword}" related to "{user_allergy}" in ingredients.',
+                    'risk_level': 'CRITICAL'
+                }
 
 
         # Check for Celiac Disease (specifically against gluten)
-        if 'celiac' in user_profile['health_conditions'].lower():
-            if 'gluten' in menu_allergens or any(keyword in menu_ingredients for keyword in self.ALLERGEN_KEYWORDS.get('gluten', [])):
+        if has_celiac:
+            if 'gluten' in menu_allergens or not self.ALLERGEN_KEYWORD_SETS['gluten'].isdisjoint(found_keywords):
                  return {
                     'safe': False,
                     'reason': 'CELIAC_DISEASE_GLUTEN: Gluten found, unsafe for celiac disease.',
@@ -81,3 +105,70 @@ class SafetyAgent:
             'reason': 'NO_CONFLICTS_FOUND: Item appears safe based on provided profile and menu data.',
             'risk_level': 'LOW'
         }
+
+    @staticmethod
+    def parse_allergies(allergies: str) -> List[str]:
+        """Splits a user's allergies string; multiple allergies are separated by '_', 'none' means no allergies."""
+        return [a.strip() for a in allergies.split('_')] if allergies != 'none' else []
+
+    def _user_allergies(self, user_profile: pd.Series) -> List[str]:
+        # Profiles prepared by the app already carry the parsed list
+        if 'allergies_list' in user_profile:
+            return user_profile['allergies_list']
+        return self.parse_allergies(user_profile['allergies'])
+
+    def _has_celiac(self, user_profile: pd.Series) -> bool:
+        if 'health_conditions_lower' in user_profile:
+            return 'celiac' in user_profile['health_conditions_lower']
+        return 'celiac' in user_profile['health_conditions'].lower()
+
+    def _find_keywords(self, text: str) -> Set[str]:
+        """Returns the allergen keywords occurring anywhere in the text (substring match)."""
+        return {keyword for _, (_, keyword) in self.KEYWORD_AUTOMATON.iter(text)}
+
+    def check_safety_batch(self, user_profile: pd.Series, menu_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Vectorised check_safety for many menu items of one user.
+
+        Args:
+            user_profile: A row from user_profiles.csv.
+            menu_df: Rows from menu.csv to evaluate.
+
+        Returns:
+            A DataFrame indexed like menu_df with the 'safe', 'reason' and 'risk_level'
+            columns check_safety would return for each row.
+        """
+        user_allergies = self._user_allergies(user_profile)
+
+        allergens = menu_df['allergens']
+        ingredients = menu_df['ingredients_clean']
+
+        # Conditions in the order check_safety tests them; np.select picks the first that holds
+        conditions = [allergens.isna().to_numpy() | (allergens.str.strip() == '').to_numpy(dtype=bool, na_value=False)]
+        reasons = ['INCOMPLETE_DATA: Allergen information missing.']
+        risk_levels = ['HIGH']
+
+        for user_allergy in user_allergies:
+            conditions.append(allergens.str.contains(user_allergy, regex=False, na=False).to_numpy(dtype=bool))
+            reasons.append(f'DIRECT_ALLERGEN_MATCH: Menu explicitly lists "{user_allergy}".')
+            risk_levels.append('CRITICAL')
+            for keyword in self.ALLERGEN_KEYWORDS.get(user_allergy, []):
+                conditions.append(ingredients.str.contains(keyword, regex=False, na=False).to_numpy(dtype=bool))
+                reasons.append(f'INGREDIENT_KEYWORD_MATCH: Found "{keyword}" related to "{user_allergy}" in ingredients.')
+                risk_levels.append('CRITICAL')
+
+        if self._has_celiac(user_profile):
+            gluten_pattern = '|'.join(map(re.escape, self.ALLERGEN_KEYWORDS['gluten']))
+            conditions.append(
+                allergens.str.contains('gluten', regex=False, na=False).to_numpy(dtype=bool)
+                | ingredients.str.contains(gluten_pattern, na=False).to_numpy(dtype=bool)
+            )
+            reasons.append('CELIAC_DISEASE_GLUTEN: Gluten found, unsafe for celiac disease.')
+            risk_levels.append('CRITICAL')
+
+        blocked = np.logical_or.reduce(conditions)
+        return pd.DataFrame({
+            'safe': ~blocked,
+            'reason': np.select(conditions, reasons, default='NO_CONFLICTS_FOUND: Item appears safe based on provided profile and menu data.'),
+            'risk_level': np.select(conditions, risk_levels, default='LOW'),
+        }, index=menu_df.index)
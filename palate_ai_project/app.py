@@ -5,23 +5,47 @@ from agents import (
     ReviewAnalysisAgent, MenuOCRAgent, OptimizationAgent
 )
 
+# Profile columns derived in load_data for the agents; hidden from the displayed profile
+DERIVED_PROFILE_COLUMNS = ['budget_min', 'budget_max', 'allergies_list', 'health_conditions_lower', 'dietary_restrictions_lower']
+
 # Load data
 @st.cache_data
 def load_data():
     user_profiles = pd.read_csv('data/user_profiles.csv')
     restaurants = pd.read_csv('data/restaurants.csv')
     menus = pd.read_csv('data/menu.csv')
+    # Arrow-backed strings: faster .str kernels and less memory for the text columns the agents scan
+    for col in ['allergens', 'ingredients_clean', 'dish_name']:
+        menus[col] = menus[col].astype('string[pyarrow]')
+    # Allergen flags read by OptimizationAgent, computed once; the allergens never change after loading
+    for allergen in ['shellfish', 'gluten', 'dairy']:
+        menus[f'has_{allergen}'] = menus['allergens'].str.contains(allergen, regex=False, na=False).astype(bool)
+    # Parse budget ranges once here rather than on every recommendation
+    user_profiles[['budget_min', 'budget_max']] = user_profiles['budget_range_myr'].str.split('-', expand=True).astype(int)
+    # Normalise the profile fields the agents match against once, not on every check
+    user_profiles['allergies_list'] = user_profiles['allergies'].map(SafetyAgent.parse_allergies)
+    user_profiles['health_conditions_lower'] = user_profiles['health_conditions'].str.lower()
+    user_profiles['dietary_restrictions_lower'] = user_profiles['dietary_restrictions'].str.lower()
     return user_profiles, restaurants, menus
 
 user_profiles, restaurants, menus = load_data()
-
-# Initialize agents
-safety_agent = SafetyAgent()
-rec_agent = RecommendationAgent(menus, restaurants)
-realtime_agent = RealTimeAgent(restaurants)
-review_agent = ReviewAnalysisAgent()
-ocr_agent = MenuOCRAgent()
-opt_agent = OptimizationAgent(menus, restaurants)
+# Id-indexed views for the single-row lookups below
+user_profiles_by_id = user_profiles.set_index('user_id', drop=False)
+restaurants_by_id = restaurants.set_index('restaurant_id', drop=False)
+
+# Initialize agents once per process; their precomputed indexes and tables survive reruns
+@st.cache_resource
+def build_agents(menus, restaurants):
+    return (
+        SafetyAgent(),
+        RecommendationAgent(menus, restaurants),
+        RealTimeAgent(restaurants),
+        ReviewAnalysisAgent(),
+        MenuOCRAgent(),
+        OptimizationAgent(menus, restaurants),
+    )
+
+safety_agent, rec_agent, realtime_agent, review_agent, ocr_agent, opt_agent = build_agents(menus, restaurants)
 
 # --- Streamlit UI ---
 st.set_page_config(layout="wide", page_title="Palate AI Demo")
@@ -30,7 +54,7 @@ st.write("Demonstrating the integration of all 6 AI agents.")
 
 # User Selection
 user_id = st.selectbox("Select a User Profile:", user_profiles['user_id'].unique())
-user_profile = user_profiles[user_profiles['user_id'] == user_id].iloc[0]
+user_profile = user_profiles_by_id.loc[user_id]
 
 # Restaurant Selection for specific agent demos
 resto_id = st.selectbox("Select a Restaurant (for specific demos):", restaurants['restaurant_id'].unique())
@@ -39,11 +63,11 @@ col1, col2 = st.columns(2)
 
 with col1:
     st.subheader(f"User Profile: {user_id}")
-    st.json(user_profile.to_dict())
+    st.json(user_profile.drop(DERIVED_PROFILE_COLUMNS).to_dict())
 
 with col2:
     st.subheader(f"Selected Restaurant: {resto_id}")
-    st.json(restaurants[restaurants['restaurant_id'] == resto_id].iloc[0].to_dict())
+    st.json(restaurants_by_id.loc[resto_id].to_dict())
 
 
 # --- Agent Interactions ---
@@ -56,13 +80,12 @@ st.dataframe(recommended_items)
 
 # 2. Safety Agent (Applied to recommendations)
 st.subheader("2. Safety Agent Applied to Recommendations")
-safe_recommendations = []
-for _, item in recommended_items.iterrows():
-    menu_details = menus[menus['menu_id'] == item['menu_id']].iloc[0]
-    safety_result = safety_agent.check_safety(user_profile, menu_details)
-    safe_rec_entry = item.to_dict()
-    safe_rec_entry.update(safety_result)
-    safe_recommendations.append(safe_rec_entry)
+# One vectorised check over the full menu rows of all recommended items (kept in recommendation order)
+menu_details = recommended_items[['menu_id']].merge(menus, on='menu_id', how='left')
+safety_results = safety_agent.check_safety_batch(user_profile, menu_details)
+safe_recommendations = pd.concat(
+    [recommended_items.reset_index(drop=True), safety_results], axis=1
+).to_dict('records')
 
 safest_items = [item for item in safe_recommendations if item['safe']]
 blocked_items = [item for item in safe_recommendations if not item['safe']]
@@ -40,6 +40,16 @@ def test_safety_agent_missing_allergens():
     assert result['safe'] == False
     assert 'incomplete_data' in result['reason'].lower()
 
+def test_safety_agent_batch_matches_single():
+    """Test that the batched check gives the same result as per-item checks."""
+    # Include copies of the items with the ingredients missing
+    menus_checked = pd.concat([menus, menus.assign(ingredients_clean=None)], ignore_index=True)
+    for user_id in ['U001', 'U007']: # No allergies; shellfish + gluten allergy
+        user = user_profiles[user_profiles['user_id'] == user_id].iloc[0]
+        results = safety_agent.check_safety_batch(user, menus_checked)
+        for (_, menu_item), (_, batch_result) in zip(menus_checked.iterrows(), results.iterrows()):
+            assert batch_result.to_dict() == safety_agent.check_safety(user, menu_item)
+
 def test_recommendation_agent_halal_filter():
     """Test that halal users only get halal restaurant options."""
     user = user_profiles[user_profiles['user_id'] == 'U001'].iloc[0] # Halal user
@@ -63,6 +73,12 @@ def test_realtime_agent_output():
     assert 'is_peak_time' in result
     assert isinstance(result['estimated_wait_minutes'], int)
 
+def test_realtime_agent_batch_output():
+    """Test that batched wait times return one minimum-respecting estimate per restaurant."""
+    result = realtime_agent.get_wait_times(['R001', 'R002', 'R001'])
+    assert len(result) == 3
+    assert all(result >= 5)
+
 def test_review_agent_safety_signal():
     """Test that review agent finds safety signals."""
     text = "Great food but I felt sick after - maybe cross-contamination?"